@@ -66,7 +66,8 @@ $(document).ready(function() {
                   "scores": json.scores,
                   "next_player": json.next_player,
                   "players": json.players,
-                  "current_step": current_step
+                  "current_step": current_step,
+                  "legal_moves": json.legal_moves
               });
               console.log(json);
               steps.push(convertedGrid);
@@ -142,6 +143,7 @@ $(document).ready(function() {
 
 
   activeBall = null;
+  let legalMoves = null;
 
 
 
@@ -187,7 +189,7 @@ $(document).ready(function() {
           activeBall.classList.add("active");
           x = parseInt(event.currentTarget.id.split("_")[1]);
           y = parseInt(event.currentTarget.id.split("_")[2]);
-          lightNeighbours(x, y);
+          lightNeighbours(x, y, getLocation(activeBall));
       } else {
           if (event.currentTarget.classList.contains("selected")) {
               secondLoc = event.currentTarget
@@ -218,7 +220,13 @@ $(document).ready(function() {
 
   }
 
-  function lightNeighbours(x, y) {
+  function isLegalMove(from, to) {
+      // Without the legal moves of the state, every neighbour is a candidate
+      if (!legalMoves) return true;
+      return legalMoves.some((move) => move.from[0] == from[0] && move.from[1] == from[1] && move.to[0] == to[0] && move.to[1] == to[1]);
+  }
+
+  function lightNeighbours(x, y, from) {
       neighbours = [
           [x - 1, y],
           [x + 1, y],
@@ -234,7 +242,7 @@ $(document).ready(function() {
       }
       for (i = 0; i < neighbours.length; i++) {
           neighbour = document.getElementById("hexa_" + neighbours[i][0] + "_" + neighbours[i][1]);
-          if (neighbour) {
+          if (neighbour && isLegalMove(from, getLocation(neighbour))) {
               neighbour.classList.add("selected");
           }
       }
@@ -323,6 +331,7 @@ $(document).ready(function() {
       scores = gridData["scores"];
       next_player = gridData["next_player"];
       current_step = gridData["current_step"];
+      legalMoves = gridData["legal_moves"] || null;
       gridData = gridData["gridData"];
 
       $("#steps").html(current_step);
@@ -418,6 +427,7 @@ $(document).ready(function() {
       next_player = board["next_player"]
       players = board["players"]
       current_step = board["current_step"]
+      const legalMoves = board["legal_moves"];
       board = board["board"]
 
       conversion = {
@@ -538,7 +548,8 @@ $(document).ready(function() {
           "scores": real_scores,
           "next_player": next_player,
           "players": players,
-          "current_step": current_step
+          "current_step": current_step,
+          "legal_moves": legalMoves
       };
   }
 
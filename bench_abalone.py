@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from board_abalone import BoardAbalone
+from game_state_abalone import GameStateAbalone
+from main_abalone import BOARD_DIM
+from my_player import CUTOFF_DEPTH, MyPlayer
+from playout_abalone import CELLS
+from seahorse.game.action import Action
+from seahorse.game.game_layout.board import Piece
+
+SUITE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_positions.txt")
+PIECE_TYPES = ("W", "B")
+EMPTY_CELL = "."
+MAX_SLOWDOWN = 1.25
+MAX_CHANGED_MOVES = 0
+
+
+def state_to_notation(state: GameStateAbalone) -> str:
+    """
+    Write a game state in the compact notation of the suite.
+
+    The notation is the content of the 61 cells in the order of CELLS ("W" first player, "B" second player,
+    "." empty), then the piece type of the player to move, the step and the scores of the first and second player,
+    separated by spaces, e.g. "WW...BB W 12 0 -1".
+
+    Args:
+        state (GameStateAbalone): the game state, its first player holding the "W" pieces
+
+    Returns:
+        str: the notation of the state
+    """
+    first_id = state.get_players()[0].get_id()
+    env = state.get_rep().get_env()
+    cells = "".join(PIECE_TYPES[env[cell].get_owner_id() != first_id] if cell in env else EMPTY_CELL
+                    for cell in CELLS)
+    to_move = PIECE_TYPES[state.get_next_player().get_id() != first_id]
+    scores = " ".join(str(int(state.get_scores()[player.get_id()])) for player in state.get_players())
+    return f"{cells} {to_move} {state.get_step()} {scores}"
+
+
+def notation_to_state(notation: str, players: List[MyPlayer]) -> GameStateAbalone:
+    """
+    Build the game state written in the compact notation of the suite.
+
+    Args:
+        notation (str): the notation, as written by `state_to_notation`
+        players (List[MyPlayer]): the first ("W") and second ("B") players
+
+    Returns:
+        GameStateAbalone: the game state
+    """
+    cells, to_move, step, *scores = notation.split()
+    if len(cells) != len(CELLS) or len(scores) != len(players):
+        raise ValueError(f"Invalid position notation: {notation}")
+    env = {}
+    for cell, piece_type in zip(CELLS, cells):
+        if piece_type != EMPTY_CELL:
+            owner = players[PIECE_TYPES.index(piece_type)]
+            env[cell] = Piece(piece_type=owner.get_piece_type(), owner=owner)
+    return GameStateAbalone(scores={player.get_id(): int(score) for player, score in zip(players, scores)},
+                            next_player=players[PIECE_TYPES.index(to_move)], players=players,
+                            rep=BoardAbalone(env=env, dim=BOARD_DIM), step=int(step))
+
+
+def load_suite(path: str = SUITE_FILE) -> Dict[str, str]:
+    """
+    Load the positions of a suite file, one "name notation" line per position, "#" starting a comment.
+
+    Args:
+        path (str, optional): path of the suite file
+
+    Returns:
+        Dict[str, str]: notation of each position, in the order of the file
+    """
+    suite = {}
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                name, notation = line.split(maxsplit=1)
+                suite[name] = notation
+    return suite
+
+
+def move_to_text(action: Optional[Action]) -> Optional[str]:
+    """
+    Write a move as its moved cell and direction, e.g. "6,2:1,1".
+
+    Args:
+        action (Action, optional): an action of `MyPlayer.minimax_search`
+
+    Returns:
+        Optional[str]: the move, None if there is none
+    """
+    if action is None:
+        return None
+    to_move_pieces, n_i, n_j = action.move
+    i, j = to_move_pieces[0]
+    return f"{i},{j}:{n_i},{n_j}"
+
+
+def search_position(notation: str, depth: int) -> dict:
+    """
+    Search a position at each depth up to the given one, each time with a fresh player.
+
+    Args:
+        notation (str): the position
+        depth (int): deepest cutoff depth searched
+
+    Returns:
+        dict: time and nodes of each depth, then time, nodes, nodes per second, best move and score of the deepest search
+    """
+    depths = []
+    for cutoff in range(depth + 1):
+        players = [MyPlayer("W", "bench_1"), MyPlayer("B", "bench_2")]
+        state = notation_to_state(notation, players)
+        player = state.get_next_player()
+        player.cutoff = cutoff
+        player.current_step = state.get_step()
+        start = time.perf_counter()
+        score, action = player.minimax_search(state)
+        elapsed = time.perf_counter() - start
+        nodes = player.statistics["nodes"]
+        depths.append({"depth": cutoff, "time": elapsed, "nodes": nodes})
+    return {
+        "depths": depths,
+        "time": elapsed,
+        "nodes": nodes,
+        "nps": nodes / elapsed if elapsed else 0.,
+        "move": move_to_text(action),
+        "score": score,
+    }
+
+
+def run_suite(suite: Dict[str, str], depth: int) -> dict:
+    """
+    Search every position of a suite.
+
+    Args:
+        suite (Dict[str, str]): notation of each position
+        depth (int): deepest cutoff depth searched
+
+    Returns:
+        dict: the settings of the run and the results of each position
+    """
+    results = {}
+    for name, notation in suite.items():
+        results[name] = search_position(notation, depth)
+        result = results[name]
+        print(f"{name:<16} {result['time']:8.2f} s {result['nodes']:9d} nodes {result['nps']:8.0f} nps  "
+              f"{str(result['move']):<10} {result['score']:.6g}")
+    return {"depth": depth, "positions": results}
+
+
+def compare(run: dict, baseline: dict, max_slowdown: float = MAX_SLOWDOWN,
+            max_changed_moves: int = MAX_CHANGED_MOVES) -> List[str]:
+    """
+    Compare a run with a baseline run on the positions they share.
+
+    Args:
+        run (dict): the run, as returned by `run_suite`
+        baseline (dict): the baseline run
+        max_slowdown (float, optional): highest allowed ratio of the total search time to the baseline one
+        max_changed_moves (int, optional): highest allowed number of positions whose best move changed
+
+    Returns:
+        List[str]: the regressions beyond the thresholds, empty if there is none
+    """
+    if run["depth"] != baseline["depth"]:
+        return [f"baseline searched to depth {baseline['depth']}, not {run['depth']}"]
+    shared = [name for name in run["positions"] if name in baseline["positions"]]
+    time_ratio = (sum(run["positions"][name]["time"] for name in shared) /
+                  max(sum(baseline["positions"][name]["time"] for name in shared), 1e-9))
+    changed = [name for name in shared if run["positions"][name]["move"] != baseline["positions"][name]["move"]]
+    print(f"{len(shared)} positions compared: time x{time_ratio:.2f}, best move changed in {len(changed)}"
+          + (f" ({', '.join(changed)})" if changed else ""))
+
+    regressions = []
+    if time_ratio > max_slowdown:
+        regressions.append(f"search time x{time_ratio:.2f} over x{max_slowdown:.2f}")
+    if len(changed) > max_changed_moves:
+        regressions.append(f"best move changed in {len(changed)} positions, over {max_changed_moves}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bench_abalone.py",
+                                     description="Searches the positions of a benchmark suite with MyPlayer and "
+                                                 "compares the results with a baseline run.")
+    parser.add_argument("-s", "--suite", default=SUITE_FILE, help="Suite file, one 'name notation' line per position")
+    parser.add_argument("-d", "--depth", type=int, default=CUTOFF_DEPTH, help="Deepest cutoff depth searched")
+    parser.add_argument("-k", "--only", nargs="*", default=None, help="Names of the positions to search")
+    parser.add_argument("-o", "--output", default=None, help="JSON file the results are written to")
+    parser.add_argument("-b", "--baseline", default=None, help="JSON results of a previous run to compare with")
+    parser.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN,
+                        help="Highest allowed ratio of the total search time to the baseline one")
+    parser.add_argument("-x", "--extract", default=None,
+                        help="Recorded game (-r flag) whose positions at the given --steps are printed in the notation")
+    parser.add_argument("--steps", type=int, nargs="*", default=[], help="Steps of the positions to extract")
+    parser.add_argument("--max-changed-moves", type=int, default=MAX_CHANGED_MOVES,
+                        help="Highest allowed number of positions whose best move changed")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if args.extract:
+        from tuning_abalone import load_recorded_game
+        name = os.path.splitext(os.path.basename(args.extract))[0]
+        for state in load_recorded_game(args.extract):
+            if state.get_step() in args.steps:
+                print(f"{name}-{state.get_step()} {state_to_notation(state)}")
+        sys.exit(0)
+
+    suite = load_suite(args.suite)
+    if args.only:
+        suite = {name: suite[name] for name in args.only}
+    run = run_suite(suite, args.depth)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(run, json.load(f), args.max_slowdown, args.max_changed_moves)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Any, List, Tuple
+from typing import Any, FrozenSet, List, Tuple
 
 import json
 from typing import Dict
@@ -39,9 +39,48 @@ class BoardAbalone(Board):
      [True,  True,  True,  True,  False, True,  True,  True,  True],
     ]
 
+    GRID_POSITIONS = [
+        ((0, 6), (0, 4)), ((0, 5), (1, 3)), ((0, 4), (2, 2)),
+        ((0, 3), (3, 1)), ((0, 2), (4, 0)), ((1, 6), (1, 5)),
+        ((1, 5), (2, 4)), ((1, 4), (3, 3)), ((1, 3), (4, 2)),
+        ((1, 2), (5, 1)), ((1, 1), (6, 0)), ((2, 7), (2, 6)),
+        ((2, 6), (3, 5)), ((2, 5), (4, 4)), ((2, 4), (5, 3)),
+        ((2, 3), (6, 2)), ((2, 2), (7, 1)), ((2, 1), (8, 0)),
+        ((3, 7), (3, 7)), ((3, 6), (4, 6)), ((3, 5), (5, 5)),
+        ((3, 4), (6, 4)), ((3, 3), (7, 3)), ((3, 2), (8, 2)),
+        ((3, 1), (9, 1)), ((4, 8), (4, 8)), ((4, 7), (5, 7)),
+        ((4, 6), (6, 6)), ((4, 5), (7, 5)), ((4, 4), (8, 4)),
+        ((4, 3), (9, 3)), ((5, 7), (6, 8)), ((5, 6), (7, 7)),
+        ((5, 5), (8, 6)), ((5, 4), (9, 5)), ((6, 7), (8, 8)),
+        ((6, 6), (9, 7)), ((5, 3), (10, 4)), ((5, 2), (11, 3)),
+        ((5, 1), (12, 2)), ((5, 0), (13, 1)), ((4, 2), (10, 2)),
+        ((4, 1), (11, 1)), ((4, 0), (12, 0)), ((6, 5), (10, 6)),
+        ((6, 4), (11, 5)), ((6, 3), (12, 4)), ((6, 2), (13, 3)),
+        ((6, 1), (14, 2)), ((7, 6), (10, 8)), ((7, 5), (11, 7)),
+        ((7, 4), (12, 6)), ((7, 3), (13, 5)), ((7, 2), (14, 4)),
+        ((7, 1), (15, 3)), ((8, 6), (12, 8)), ((8, 5), (13, 7)),
+        ((8, 4), (14, 6)), ((8, 3), (15, 5)), ((8, 2), (16, 4)),
+        ((3, 0), (10, 0))
+    ]
+
     def __init__(self, env: dict[tuple[int], Piece], dim: list[int]) -> None:
         super().__init__(env, dim)
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "env":
+            self.invalidate_cache()
+        super().__setattr__(name, value)
+
+    def invalidate_cache(self) -> None:
+        """
+        Forget the views derived from the environment.
+
+        They are recomputed on their next access. Replacing `env` invalidates them automatically,
+        this must be called after mutating `env` in place.
+        """
+        self._grid = None
+        self._pieces_coordinates = None
+
     def __str__(self) -> str:
         """
         Return a string representation of the board.
@@ -91,52 +130,83 @@ class BoardAbalone(Board):
                 neighbours[k] = (self.env[neighbours[k]].get_type(),neighbours[k])
         return neighbours
 
+    @staticmethod
+    def manhattan_distance(a: Tuple[int, int], b: Tuple[int, int]) -> float:
+        """
+        Compute the distance between two cells of the board, in number of moves.
+
+        Args:
+            a (Tuple[int, int]): first cell
+            b (Tuple[int, int]): second cell
+
+        Returns:
+            float: distance between the two cells
+        """
+        mask1 = [(0,2),(1,3),(2,4)]
+        mask2 = [(0,4)]
+        diff = (abs(b[0] - a[0]),abs(b[1] - a[1]))
+        dist = (abs(b[0] - a[0]) + abs(b[1] - a[1]))/2
+        if diff in mask1:
+            dist += 1
+        if diff in mask2:
+            dist += 2
+        return dist
+
     def get_grid(self) -> List[List[int]]:
         """
         Return a nice representation of the board.
 
+        The grid is computed once per board and shared between callers, it must not be modified.
+
         Returns:
             str: The nice representation of the board.
         """
-        grid_data = [
-            [0, 0, 2, 2, 2, 2, 2, 0, 0],
-            [0, 2, 2, 2, 2, 2, 2, 0, 0],
-            [0, 3, 3, 2, 2, 2, 3, 3, 0],
-            [3, 3, 3, 3, 3, 3, 3, 3, 0],
-            [3, 3, 3, 3, 3, 3, 3, 3, 3],
-            [3, 3, 3, 3, 3, 3, 3, 3, 0],
-            [0, 3, 3, 1, 1, 1, 3, 3, 0],
-            [0, 1, 1, 1, 1, 1, 1, 0, 0],
-            [0, 0, 1, 1, 1, 1, 1, 0, 0],
-        ]
-        positions = [
-            ((0, 6), (0, 4)), ((0, 5), (1, 3)), ((0, 4), (2, 2)),
-            ((0, 3), (3, 1)), ((0, 2), (4, 0)), ((1, 6), (1, 5)),
-            ((1, 5), (2, 4)), ((1, 4), (3, 3)), ((1, 3), (4, 2)),
-            ((1, 2), (5, 1)), ((1, 1), (6, 0)), ((2, 7), (2, 6)),
-            ((2, 6), (3, 5)), ((2, 5), (4, 4)), ((2, 4), (5, 3)),
-            ((2, 3), (6, 2)), ((2, 2), (7, 1)), ((2, 1), (8, 0)),
-            ((3, 7), (3, 7)), ((3, 6), (4, 6)), ((3, 5), (5, 5)),
-            ((3, 4), (6, 4)), ((3, 3), (7, 3)), ((3, 2), (8, 2)),
-            ((3, 1), (9, 1)), ((4, 8), (4, 8)), ((4, 7), (5, 7)),
-            ((4, 6), (6, 6)), ((4, 5), (7, 5)), ((4, 4), (8, 4)),
-            ((4, 3), (9, 3)), ((5, 7), (6, 8)), ((5, 6), (7, 7)),
-            ((5, 5), (8, 6)), ((5, 4), (9, 5)), ((6, 7), (8, 8)),
-            ((6, 6), (9, 7)), ((5, 3), (10, 4)), ((5, 2), (11, 3)),
-            ((5, 1), (12, 2)), ((5, 0), (13, 1)), ((4, 2), (10, 2)),
-            ((4, 1), (11, 1)), ((4, 0), (12, 0)), ((6, 5), (10, 6)),
-            ((6, 4), (11, 5)), ((6, 3), (12, 4)), ((6, 2), (13, 3)),
-            ((6, 1), (14, 2)), ((7, 6), (10, 8)), ((7, 5), (11, 7)),
-            ((7, 4), (12, 6)), ((7, 3), (13, 5)), ((7, 2), (14, 4)),
-            ((7, 1), (15, 3)), ((8, 6), (12, 8)), ((8, 5), (13, 7)),
-            ((8, 4), (14, 6)), ((8, 3), (15, 5)), ((8, 2), (16, 4)),
-            ((3, 0), (10, 0))
-        ]
-
-        for x,y in positions:
-            grid_data[x[0]][x[1]] = self.get_env().get(y).get_type() if  self.get_env().get(y) else BoardAbalone.EMPTY_POS
-
-        return grid_data
+        if self._grid is None:
+            grid_data = [
+                [0, 0, 2, 2, 2, 2, 2, 0, 0],
+                [0, 2, 2, 2, 2, 2, 2, 0, 0],
+                [0, 3, 3, 2, 2, 2, 3, 3, 0],
+                [3, 3, 3, 3, 3, 3, 3, 3, 0],
+                [3, 3, 3, 3, 3, 3, 3, 3, 3],
+                [3, 3, 3, 3, 3, 3, 3, 3, 0],
+                [0, 3, 3, 1, 1, 1, 3, 3, 0],
+                [0, 1, 1, 1, 1, 1, 1, 0, 0],
+                [0, 0, 1, 1, 1, 1, 1, 0, 0],
+            ]
+            env = self.get_env()
+            for x,y in BoardAbalone.GRID_POSITIONS:
+                grid_data[x[0]][x[1]] = env.get(y).get_type() if env.get(y) else BoardAbalone.EMPTY_POS
+            self._grid = grid_data
+        return self._grid
+
+    def get_pieces_coordinates(self, piece_type: str) -> FrozenSet[Tuple[int, int]]:
+        """
+        Return the coordinates of the pieces of a given type.
+
+        Args:
+            piece_type (str): type of the pieces
+
+        Returns:
+            FrozenSet[Tuple[int, int]]: coordinates of the pieces
+        """
+        if self._pieces_coordinates is None:
+            coordinates = {}
+            for coordinate, piece in self.get_env().items():
+                coordinates.setdefault(piece.get_type(), set()).add(coordinate)
+            self._pieces_coordinates = {t: frozenset(c) for t, c in coordinates.items()}
+        return self._pieces_coordinates.get(piece_type, frozenset())
+
+    def count_pieces(self, piece_type: str) -> int:
+        """
+        Return the number of pieces of a given type on the board.
+
+        Args:
+            piece_type (str): type of the pieces
+
+        Returns:
+            int: number of pieces
+        """
+        return len(self.get_pieces_coordinates(piece_type))
 
     def to_json(self) -> dict:
         """
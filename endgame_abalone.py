@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional, Tuple
+
+from playout_abalone import NEIGHBOURS, Move, Position
+
+SOLVER_PLIES = 4
+MAX_NODES = 400_000
+WIN, DRAW, LOSS = 1, 0, -1
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class NodeBudgetExceeded(Exception):
+    pass
+
+
+class EndgameSolver:
+    """
+    Exact solver of the last plies of a game, searching every line down to the end of the game.
+
+    Final positions are scored with the outcome rule of `GameStateAbalone.compute_winner_ids` (scores, then the
+    distance to the centre), so the value of a position is a win, a draw or a loss for the player to move.
+    Solved positions are kept in a transposition table of their own, with bound flags since alpha-beta cutoffs
+    only prove bounds. A search visiting more than `max_nodes` positions is abandoned.
+
+    Attributes:
+        max_nodes (int): number of positions a search may visit
+        nodes (int): number of positions visited by the last search
+        table (Dict[tuple, Tuple[int, int]]): value and flag (EXACT, LOWER or UPPER) of the solved positions
+    """
+
+    def __init__(self, max_nodes: int = MAX_NODES) -> None:
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.table: Dict[tuple, Tuple[int, int]] = {}
+
+    def solve(self, position: Position) -> Optional[Tuple[int, Move]]:
+        """
+        Find the best move of the player to move, searched to the end of the game.
+
+        Args:
+            position (Position): the position to solve, played on and restored in place
+
+        Returns:
+            Optional[Tuple[int, Move]]: WIN, DRAW or LOSS for the player to move and a move reaching it,
+            None if the game is over or the node budget was exceeded
+        """
+        self.nodes = 0
+        best = None
+        alpha = LOSS
+        try:
+            for move in self.ordered_moves(position):
+                ejected = position.play(*move)
+                try:
+                    value = -self.negamax(position, LOSS, -alpha)
+                finally:
+                    position.undo(*move, ejected)
+                if best is None or value > best[0]:
+                    best = (value, move)
+                    alpha = max(alpha, value)
+                if value == WIN:
+                    break
+        except NodeBudgetExceeded:
+            return None
+        return best
+
+    def negamax(self, position: Position, alpha: int, beta: int) -> int:
+        """
+        Alpha-beta search of a position down to the end of the game.
+
+        Args:
+            position (Position): the position, restored in place
+            alpha (int): value already guaranteed to the player to move
+            beta (int): value already guaranteed to the opponent
+
+        Returns:
+            int: the value of the position for the player to move, exact if it lies strictly between alpha and beta
+        """
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise NodeBudgetExceeded
+        if position.is_done():
+            return self.outcome(position)
+
+        key = (bytes(position.board), position.scores[0], position.scores[1], position.to_move, position.step)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                return value
+
+        moves = self.ordered_moves(position)
+        if not moves:
+            return self.outcome(position)
+        original_alpha = alpha
+        value = LOSS
+        for move in moves:
+            ejected = position.play(*move)
+            try:
+                value = max(value, -self.negamax(position, -beta, -alpha))
+            finally:
+                position.undo(*move, ejected)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if value <= original_alpha:
+            flag = UPPER
+        elif value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (value, flag)
+        return value
+
+    def outcome(self, position: Position) -> int:
+        winner = position.winner()
+        if winner == 0:
+            return DRAW
+        return WIN if winner == position.to_move else LOSS
+
+    def ordered_moves(self, position: Position) -> List[Move]:
+        """
+        Order the legal moves: captures first, then quiet moves, then moves pushing one's own piece off the board.
+
+        Args:
+            position (Position): the position
+
+        Returns:
+            List[Move]: the ordered moves
+        """
+        captures = []
+        quiet_moves = []
+        suicides = []
+        board = position.board
+        for move in position.legal_moves():
+            cell, direction, length = move
+            last = cell
+            for _ in range(length - 1):
+                last = NEIGHBOURS[last][direction]
+            if NEIGHBOURS[last][direction] >= 0:
+                quiet_moves.append(move)
+            elif board[last] == position.to_move:
+                suicides.append(move)
+            else:
+                captures.append(move)
+        return captures + quiet_moves + suicides
+
+    def to_json(self) -> dict:
+        return {}
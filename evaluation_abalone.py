@@ -0,0 +1,180 @@
+import abc
+import json
+import math
+import os
+from typing import List, Optional, Tuple
+
+from game_state_abalone import GameStateAbalone
+from seahorse.game.action import Action
+
+CENTER = (8, 4)
+COORDINATES_IN_SAME_ROW = [((-1, -1), (1, 1)), ((-2, 0), (2, 0)), ((-1, 1), (1, -1))]
+HEURISTIC_FEATURES = ("distance_to_center", "pieces_alive", "pieces_together", "pieces_in_a_row")
+DEFAULT_HEURISTIC_WEIGHTS = {"distance_to_center": 1, "pieces_alive": 1000, "pieces_together": 1, "pieces_in_a_row": 1}
+HEURISTIC_WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heuristic_weights.json")
+EVALUATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "evaluation_weights.npz")
+FUTILITY_MARGIN = 20
+
+
+def load_heuristic_weights(path: str = HEURISTIC_WEIGHTS_FILE) -> List[float]:
+    """
+    Load the heuristic weights exported by the tuning tool, in the order of HEURISTIC_FEATURES.
+
+    Args:
+        path (str, optional): path of the weights file, missing weights keep their default value
+
+    Returns:
+        List[float]: weight of each heuristic feature
+    """
+    weights = dict(DEFAULT_HEURISTIC_WEIGHTS)
+    if os.path.isfile(path):
+        with open(path) as f:
+            weights.update(json.load(f))
+    return [weights[feature] for feature in HEURISTIC_FEATURES]
+
+
+def load_evaluator(path: str = EVALUATION_FILE) -> "Evaluator":
+    """
+    Load the evaluation of MyPlayer: the model of the evaluation file if there is one, the heuristic otherwise.
+
+    Args:
+        path (str, optional): path of the evaluation file, a linear model or an MLP saved by `models_abalone`
+
+    Returns:
+        Evaluator: the evaluation backend
+    """
+    if not os.path.isfile(path):
+        return HeuristicEvaluator()
+    # NumPy is only needed, and imported, for learned evaluations.
+    from models_abalone import load_model
+    return load_model(path)
+
+
+class Evaluator(abc.ABC):
+    """
+    Evaluation backend of MyPlayer, scoring batches of positions for a player.
+
+    Attributes:
+        batched (bool): whether a batch costs much less than its positions one by one, in which case the search
+            evaluates the children of the nodes at the depth limit in a single call
+        futility_margin (float): bound on the change of evaluation caused by a move that captures no piece,
+            infinite to disable futility pruning
+    """
+
+    batched = False
+    futility_margin = math.inf
+
+    @abc.abstractmethod
+    def evaluate(self, states: List[GameStateAbalone], piece_type: str) -> List[float]:
+        """
+        Evaluate positions.
+
+        Args:
+            states (List[GameStateAbalone]): the positions
+            piece_type (str): piece type of the player the evaluation is for
+
+        Returns:
+            List[float]: value of each position, the higher the better for the player
+        """
+
+    def evaluate_children(self, state: GameStateAbalone, actions: List[Action],
+                          piece_type: str) -> Tuple[float, List[float]]:
+        """
+        Evaluate a position and the positions its actions lead to, in a single batch.
+
+        Args:
+            state (GameStateAbalone): the position
+            actions (List[Action]): actions of the position
+            piece_type (str): piece type of the player the evaluation is for
+
+        Returns:
+            Tuple[float, List[float]]: value of the position and of the position reached by each action
+        """
+        scores = self.evaluate([state] + [action.get_next_game_state() for action in actions], piece_type)
+        return scores[0], scores[1:]
+
+    def to_json(self) -> dict:
+        return {}
+
+
+class HeuristicEvaluator(Evaluator):
+    """
+    Weighted sum of hand-written features: distance to the centre, pieces alive, pieces together and pieces in a row.
+
+    Attributes:
+        weights (List[float]): weight of each feature of HEURISTIC_FEATURES
+    """
+
+    def __init__(self, weights: Optional[List[float]] = None) -> None:
+        self.weights = weights if weights is not None else load_heuristic_weights()
+        # A quiet move changes the positional features by a bounded amount, so the margin scales with their weights.
+        self.futility_margin = FUTILITY_MARGIN * max(
+            abs(weight) for feature, weight in zip(HEURISTIC_FEATURES, self.weights) if feature != "pieces_alive")
+
+    def evaluate(self, states: List[GameStateAbalone], piece_type: str) -> List[float]:
+        return [self.heuristic(state, piece_type) for state in states]
+
+    def heuristic(self, state: GameStateAbalone, piece_type: str) -> float:
+        score = 0
+        for weight, feature in zip(self.weights, self.heuristic_features(state, piece_type)):
+            score += weight * feature
+        return score
+
+    def heuristic_features(self, state: GameStateAbalone, piece_type: str) -> List[float]:
+        other_piece_type = 'W' if piece_type == 'B' else 'B'
+        return [
+            self.distance_to_center_heuristic(state, other_piece_type) -
+            self.distance_to_center_heuristic(state, piece_type),
+            self.pieces_alive(state, piece_type) - self.pieces_alive(state, other_piece_type),
+            self.pieces_together_heuristic(state, piece_type) -
+            self.pieces_together_heuristic(state, other_piece_type),
+            self.pieces_in_a_row_heuristic(state, piece_type) -
+            self.pieces_in_a_row_heuristic(state, other_piece_type),
+        ]
+
+    def distance_to_center_heuristic(self, state: GameStateAbalone, piece_type: str) -> float:
+        score = 0
+        for coordinate in state.get_rep().get_pieces_coordinates(piece_type):
+            score += self.euclidian_distance(coordinate, CENTER)
+        return score
+
+    def pieces_together_heuristic(self, state: GameStateAbalone, piece_type: str) -> int:
+        number_of_pieces_around = 0
+        coordinates = state.get_rep().get_pieces_coordinates(piece_type)
+
+        for coordinate in coordinates:
+            for row_coordinates in COORDINATES_IN_SAME_ROW:
+                for coordinate_difference in row_coordinates:
+                    if self.calculate_neighbor_coordinate(coordinate, coordinate_difference) in coordinates:
+                        number_of_pieces_around += 1
+        return number_of_pieces_around
+
+    def pieces_in_a_row_heuristic(self, state: GameStateAbalone, piece_type: str) -> float:
+        score = 0
+        coordinates = state.get_rep().get_pieces_coordinates(piece_type)
+
+        for coordinate in coordinates:
+            for row_coordinates in COORDINATES_IN_SAME_ROW:
+                coordinates_to_check = self.calculate_neighbor_coordinate(coordinate, row_coordinates[0]), \
+                                       self.calculate_neighbor_coordinate(coordinate, row_coordinates[1])
+
+                if coordinates_to_check[0] in coordinates and coordinates_to_check[1] in coordinates:
+                    score += 1
+                    outer_coordinates_to_check = self.calculate_neighbor_coordinate(coordinates_to_check[0],
+                                                                                    row_coordinates[0]), \
+                                                 self.calculate_neighbor_coordinate(coordinates_to_check[1],
+                                                                                    row_coordinates[1])
+
+                    if outer_coordinates_to_check[0] in coordinates or outer_coordinates_to_check[1] in coordinates:
+                        score -= 1
+
+        return score
+
+    def calculate_neighbor_coordinate(self, coordinate: Tuple[int, int], difference: Tuple[int, int]) -> Tuple[int, int]:
+        return coordinate[0] + difference[0], coordinate[1] + difference[1]
+
+    def euclidian_distance(self, position1: Tuple[int, int], position2: Tuple[int, int]) -> float:
+        return ((position1[0] - position2[0]) ** 2 + (position1[1] - position2[1]) ** 2) ** 0.5
+
+    def pieces_alive(self, state: GameStateAbalone, piece_type: str) -> int:
+        return 10 * state.get_rep().count_pieces(piece_type)
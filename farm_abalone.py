@@ -0,0 +1,514 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from os.path import basename, splitext
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from main_abalone import build_initial_state
+from selfplay_abalone import RANDOM_PLIES, SEARCH_DEPTH, SHARD_SIZE, ShardWriter, play_game, quiet_worker
+from server_abalone import TIME_LIMIT, load_player_class
+
+LEASE_TIME = 120
+HEARTBEAT_INTERVAL = 30
+MAX_ATTEMPTS = 3
+COMMIT_GAMES = 100
+COMMIT_INTERVAL = 60
+WAIT_DELAY = 1
+LINE_LIMIT = 1 << 24
+
+
+def encode_arrays(arrays: Dict[str, np.ndarray]) -> Dict[str, List[str]]:
+    """
+    Encode NumPy arrays for a JSON message, as their dtype and base64 bytes.
+
+    Args:
+        arrays (Dict[str, np.ndarray]): one-dimensional or two-dimensional arrays
+
+    Returns:
+        Dict[str, List[str]]: the dtype, shape and base64 content of each array
+    """
+    return {name: [array.dtype.str, ",".join(map(str, array.shape)), base64.b64encode(array.tobytes()).decode()]
+            for name, array in arrays.items()}
+
+
+def decode_arrays(encoded: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+    """
+    Decode the arrays encoded by `encode_arrays`.
+
+    Args:
+        encoded (Dict[str, List[str]]): the encoded arrays
+
+    Returns:
+        Dict[str, np.ndarray]: the arrays
+    """
+    arrays = {}
+    for name, (dtype, shape, content) in encoded.items():
+        shape = tuple(int(size) for size in shape.split(",") if size)
+        arrays[name] = np.frombuffer(base64.b64decode(content), dtype=dtype).reshape(shape)
+    return arrays
+
+
+def play_match(players: List[str], config: str, seed: int, time_limit: float) -> Dict[str, Any]:
+    """
+    Play a headless game between two player files, with the time credits and legality checks of the server.
+
+    Args:
+        players (List[str]): paths of the player files of the first ("W") and second ("B") players
+        config (str): starting board configuration
+        seed (int): seed of the random generators of the players
+        time_limit (float): time credit of each player, in seconds
+
+    Returns:
+        Dict[str, Any]: names, scores, winners and number of steps of the game, and whether it ended on a forfeit
+    """
+    random.seed(seed)
+    instances = [load_player_class(path)(piece_type, name=f"{splitext(basename(path))[0]}_{index + 1}",
+                                         time_limit=time_limit)
+                 for index, (path, piece_type) in enumerate(zip(players, ("W", "B")))]
+    state = build_initial_state(instances[0], instances[1], config)
+    scores = None
+    while not state.is_done():
+        player = state.get_next_player()
+        try:
+            player.start_timer()
+            action = player.compute_action(current_state=state)
+            player.stop_timer()
+            if player.get_remaining_time() <= 0:
+                raise TimeoutError("time credit expired")
+            # Actions of a transposition table may belong to another state with the same board.
+            action = state.convert_board_to_action(
+                {cell: piece.get_type() for cell, piece in action.get_next_game_state().get_rep().get_env().items()})
+            if action is None:
+                raise ValueError("action not permitted")
+        except Exception as e:
+            logger.warning(f"{player.get_name()} forfeits ({e!r})")
+            scores = {player_id: score for player_id, score in state.get_scores().items()
+                      if player_id != player.get_id()}
+            break
+        state = action.get_next_game_state()
+
+    winner_ids = state.compute_winner_ids(scores)
+    return {"players": [player.get_name() for player in instances],
+            "scores": [state.get_scores()[player.get_id()] for player in instances],
+            "winners": [player.get_name() for player in instances if player.get_id() in winner_ids],
+            "steps": state.get_step(), "forfeit": scores is not None}
+
+
+def run_job(job: Dict[str, Any]) -> Any:
+    """
+    Run a job in a worker process.
+
+    Args:
+        job (Dict[str, Any]): the job, whose kind is "game" (a match between player files) or "selfplay"
+        (a labelled self-play game)
+
+    Returns:
+        Any: the JSON-serializable result of the job
+    """
+    if job["kind"] == "game":
+        return play_match(**job["args"])
+    if job["kind"] == "selfplay":
+        return encode_arrays(play_game(**job["args"]))
+    raise ValueError(f"Unknown job kind: {job['kind']}")
+
+
+async def send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+
+
+async def receive(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    line = await reader.readline()
+    return json.loads(line) if line else None
+
+
+class Coordinator:
+    """
+    Hand out jobs to workers over TCP and collect their results, each job being completed exactly once.
+
+    Messages are JSON lines. A worker asks for a job with "request" and gets a "job", "wait" (every remaining job
+    is leased) or "done" (every job is finished). A job is leased to the worker for `lease_time` seconds,
+    extended by each "heartbeat" of the worker; it goes back to the queue when the lease expires or the worker
+    disconnects, and after a reported "error" up to `max_attempts` attempts. Only the worker holding the lease of
+    a job may complete it: a result arriving after its lease expired, the job being back in the queue or handed to
+    another worker, is dropped.
+
+    Attributes:
+        jobs (Dict[str, Dict[str, Any]]): the jobs by ID
+        on_result (Callable[[str, Any], None]): called with the ID and the result of each completed job
+        on_failure (Callable[[str], None]): called with the ID of each job given up, if any
+        lease_time (float): duration of a lease, in seconds
+        max_attempts (int): number of failed attempts after which a job is given up
+        pending (deque): IDs of the jobs waiting for a worker
+        leases (Dict[str, Tuple[float, int]]): deadline and worker connection of each leased job
+        attempts (Dict[str, int]): number of failed attempts of each job
+        finished (Dict[str, bool]): whether each finished job succeeded
+    """
+
+    def __init__(self, jobs: List[Dict[str, Any]], on_result: Callable[[str, Any], None],
+                 on_failure: Optional[Callable[[str], None]] = None, lease_time: float = LEASE_TIME,
+                 max_attempts: int = MAX_ATTEMPTS) -> None:
+        self.jobs = {job["job_id"]: job for job in jobs}
+        self.on_result = on_result
+        self.on_failure = on_failure
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        self.pending = deque(self.jobs)
+        self.leases = {}
+        self.attempts = {job_id: 0 for job_id in self.jobs}
+        self.finished = {}
+        self.all_finished = asyncio.Event()
+        self.connections = 0
+        if not self.jobs:
+            self.all_finished.set()
+
+    def lease(self, connection: int) -> Optional[Dict[str, Any]]:
+        self.expire_leases()
+        if not self.pending:
+            return None
+        job_id = self.pending.popleft()
+        self.leases[job_id] = (time.monotonic() + self.lease_time, connection)
+        return self.jobs[job_id]
+
+    def expire_leases(self) -> None:
+        now = time.monotonic()
+        for job_id, (deadline, _) in list(self.leases.items()):
+            if deadline < now:
+                logger.warning(f"Lease of {job_id} expired, requeued")
+                self.release(job_id)
+
+    def release(self, job_id: str) -> None:
+        del self.leases[job_id]
+        self.pending.appendleft(job_id)
+
+    def heartbeat(self, job_id: str, connection: int) -> None:
+        if self.leases.get(job_id, (None, None))[1] == connection:
+            self.leases[job_id] = (time.monotonic() + self.lease_time, connection)
+
+    def complete(self, job_id: str, connection: int, result: Any) -> None:
+        self.expire_leases()
+        if self.leases.get(job_id, (None, None))[1] != connection:
+            logger.info(f"Dropping a result of {job_id} from a worker no longer holding its lease")
+            return
+        del self.leases[job_id]
+        self.on_result(job_id, result)
+        self.finish(job_id, True)
+
+    def fail(self, job_id: str, connection: int, error: str) -> None:
+        if self.leases.get(job_id, (None, None))[1] != connection:
+            return
+        self.attempts[job_id] += 1
+        if self.attempts[job_id] < self.max_attempts:
+            logger.warning(f"{job_id} failed ({error}), retrying")
+            self.release(job_id)
+        else:
+            logger.error(f"{job_id} failed {self.attempts[job_id]} times ({error}), giving up")
+            del self.leases[job_id]
+            if self.on_failure is not None:
+                self.on_failure(job_id)
+            self.finish(job_id, False)
+
+    def finish(self, job_id: str, success: bool) -> None:
+        self.finished[job_id] = success
+        if len(self.finished) == len(self.jobs):
+            self.all_finished.set()
+
+    async def handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve the messages of a worker connection until it closes, then requeue the jobs it still holds.
+
+        Args:
+            reader (asyncio.StreamReader): the connection's input
+            writer (asyncio.StreamWriter): the connection's output
+        """
+        self.connections += 1
+        connection = self.connections
+        peer = writer.get_extra_info("peername")
+        logger.info(f"Worker {connection} connected from {peer}")
+        try:
+            while (message := await receive(reader)) is not None:
+                kind = message.get("type")
+                if kind == "request":
+                    job = self.lease(connection)
+                    if job is not None:
+                        await send(writer, {"type": "job", "job": job})
+                    elif self.all_finished.is_set():
+                        await send(writer, {"type": "done"})
+                    else:
+                        await send(writer, {"type": "wait", "delay": WAIT_DELAY})
+                elif kind == "heartbeat":
+                    self.heartbeat(message["job_id"], connection)
+                elif kind == "result":
+                    self.complete(message["job_id"], connection, message["result"])
+                elif kind == "error":
+                    self.fail(message["job_id"], connection, message.get("error", ""))
+        except (ConnectionError, json.JSONDecodeError) as e:
+            logger.warning(f"Worker {connection} dropped: {e!r}")
+        finally:
+            for job_id, (_, holder) in list(self.leases.items()):
+                if holder == connection:
+                    logger.warning(f"Worker {connection} left while running {job_id}, requeued")
+                    self.release(job_id)
+            writer.close()
+
+    async def serve(self, hostname: str, port: int) -> Dict[str, bool]:
+        """
+        Listen for workers until every job is finished.
+
+        Args:
+            hostname (str): address to listen on
+            port (int): port to listen on
+
+        Returns:
+            Dict[str, bool]: whether each job succeeded
+        """
+        server = await asyncio.start_server(self.handle_worker, hostname, port, limit=LINE_LIMIT)
+        logger.info(f"Coordinating {len(self.pending)} jobs on {hostname}:{port}")
+        await self.all_finished.wait()
+        # Let the workers waiting for a job learn that there is none left.
+        await asyncio.sleep(WAIT_DELAY * 2)
+        server.close()
+        await server.wait_closed()
+        return self.finished
+
+
+async def work_slot(hostname: str, port: int, executor: ProcessPoolExecutor) -> int:
+    """
+    Ask the coordinator for jobs and run them one at a time in the process pool until there are none left.
+
+    Args:
+        hostname (str): address of the coordinator
+        port (int): port of the coordinator
+        executor (ProcessPoolExecutor): the pool running the jobs
+
+    Returns:
+        int: number of jobs run
+    """
+    reader, writer = await asyncio.open_connection(hostname, port, limit=LINE_LIMIT)
+    loop = asyncio.get_running_loop()
+    jobs = 0
+    try:
+        while True:
+            await send(writer, {"type": "request"})
+            message = await receive(reader)
+            if message is None or message["type"] == "done":
+                return jobs
+            if message["type"] == "wait":
+                await asyncio.sleep(message["delay"])
+                continue
+            job = message["job"]
+            future = loop.run_in_executor(executor, run_job, job)
+            while True:
+                try:
+                    result = await asyncio.wait_for(asyncio.shield(future), HEARTBEAT_INTERVAL)
+                    await send(writer, {"type": "result", "job_id": job["job_id"], "result": result})
+                    break
+                except asyncio.TimeoutError:
+                    await send(writer, {"type": "heartbeat", "job_id": job["job_id"]})
+                except Exception as e:
+                    await send(writer, {"type": "error", "job_id": job["job_id"], "error": repr(e)})
+                    break
+            jobs += 1
+    finally:
+        writer.close()
+
+
+async def work(hostname: str, port: int, processes: Optional[int] = None) -> int:
+    """
+    Run a worker: one connection to the coordinator per worker process.
+
+    Args:
+        hostname (str): address of the coordinator
+        port (int): port of the coordinator
+        processes (int, optional): number of jobs run at once, defaults to the number of CPUs
+
+    Returns:
+        int: number of jobs run
+    """
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, initializer=quiet_worker) as executor:
+        return sum(await asyncio.gather(*(work_slot(hostname, port, executor) for _ in range(processes))))
+
+
+class SelfPlaySink:
+    """
+    Stream self-play results to a ShardWriter in the order of their seeds, so that its manifest stays resumable.
+
+    A game given up by the coordinator is skipped, and recorded in the manifest, so that the games after it are
+    still written. The writer is committed whenever it writes a shard, and otherwise every `commit_games` games or
+    `commit_interval` seconds, since each commit rewrites the positions pending for the next shard.
+
+    Attributes:
+        writer (ShardWriter): the shard writer
+        next_game (int): index of the next game to write
+        completed (Dict[int, Optional[Dict[str, np.ndarray]]]): results received ahead of the next game, None for
+            the games given up
+        commit_games (int): number of written games after which the writer is committed
+        commit_interval (float): time after which written games are committed, in seconds
+        uncommitted (int): number of games written since the last commit
+        committed_at (float): time of the last commit
+    """
+
+    def __init__(self, writer: ShardWriter, commit_games: int = COMMIT_GAMES,
+                 commit_interval: float = COMMIT_INTERVAL) -> None:
+        self.writer = writer
+        self.next_game = writer.games
+        self.completed = {}
+        self.commit_games = commit_games
+        self.commit_interval = commit_interval
+        self.uncommitted = 0
+        self.committed_at = time.monotonic()
+
+    def __call__(self, job_id: str, result: Dict[str, List[str]]) -> None:
+        self.completed[int(job_id.rsplit("-", 1)[1])] = decode_arrays(result)
+        self.flush()
+
+    def skip(self, job_id: str) -> None:
+        self.completed[int(job_id.rsplit("-", 1)[1])] = None
+        self.flush()
+
+    def flush(self) -> None:
+        while self.next_game in self.completed:
+            game = self.completed.pop(self.next_game)
+            shards = len(self.writer.manifest["shards"])
+            if game is None:
+                self.writer.skip(self.next_game)
+            else:
+                self.writer.append(game)
+            self.next_game += 1
+            self.uncommitted += 1
+            if len(self.writer.manifest["shards"]) != shards:
+                # Writing a shard commits the writer.
+                self.uncommitted = 0
+                self.committed_at = time.monotonic()
+        if (self.uncommitted >= self.commit_games
+                or self.uncommitted and time.monotonic() - self.committed_at >= self.commit_interval):
+            self.commit()
+
+    def commit(self) -> None:
+        self.writer.commit()
+        self.uncommitted = 0
+        self.committed_at = time.monotonic()
+
+
+class ResultsFile:
+    """
+    Append game results to a JSON lines file, which also tells which jobs a previous run completed.
+
+    Attributes:
+        path (str): path of the file
+        done (set): IDs of the jobs whose result is in the file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.done = set()
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.done = {json.loads(line)["job_id"] for line in f if line.strip()}
+
+    def __call__(self, job_id: str, result: Dict[str, Any]) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"job_id": job_id, **result}) + "\n")
+        self.done.add(job_id)
+        logger.info(f"{job_id}: {' vs '.join(result['players'])} - scores {result['scores']}"
+                    f" - winner(s) {', '.join(result['winners'])}")
+
+
+def selfplay_jobs(writer: ShardWriter, games: int, depth: int, random_plies: int, config: str,
+                  seed: int) -> List[Dict[str, Any]]:
+    """
+    List the self-play games of a run not written yet, game i being played with seed + i.
+
+    Returns:
+        List[Dict[str, Any]]: one job per game
+    """
+    return [{"job_id": f"selfplay-{game}", "kind": "selfplay",
+             "args": {"seed": seed + game, "depth": depth, "random_plies": random_plies, "config": config}}
+            for game in range(writer.games, games)]
+
+
+def tournament_jobs(players: List[str], games: int, config: str, seed: int, time_limit: float,
+                    done: set) -> List[Dict[str, Any]]:
+    """
+    List the games of a round robin between player files not played yet, colours alternating between games.
+
+    Returns:
+        List[Dict[str, Any]]: one job per game
+    """
+    jobs = []
+    for first, second in combinations(players, 2):
+        for game in range(games):
+            pair = [first, second] if game % 2 == 0 else [second, first]
+            job_id = f"{splitext(basename(first))[0]}-{splitext(basename(second))[0]}-{game}"
+            if job_id not in done:
+                jobs.append({"job_id": job_id, "kind": "game",
+                             "args": {"players": pair, "config": config, "seed": seed + game,
+                                      "time_limit": time_limit}})
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="farm_abalone.py",
+                                     description="Spreads self-play games and tournaments over worker machines: "
+                                                 "a coordinator hands out the games, workers play them.")
+    parser.add_argument("-a", "--address", default="localhost", help="Address of the coordinator")
+    parser.add_argument("-p", "--port", type=int, default=16002, help="Port of the coordinator")
+    parser.add_argument("-l", "--log", choices=["DEBUG", "INFO", "WARNING"], default="INFO", help="Logging level")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    selfplay = subparsers.add_parser("selfplay", help="Coordinate self-play games written to NumPy shards")
+    selfplay.add_argument("directory", help="Output directory, an interrupted run in it is resumed")
+    selfplay.add_argument("-n", "--games", type=int, required=True, help="Total number of games")
+    selfplay.add_argument("-s", "--shard-size", type=int, default=SHARD_SIZE, help="Number of positions per shard")
+    selfplay.add_argument("-d", "--depth", type=int, default=SEARCH_DEPTH, help="Search depth of the players")
+    selfplay.add_argument("--random-plies", type=int, default=RANDOM_PLIES, help="Random moves at the start of each game")
+    selfplay.add_argument("-c", "--config", choices=["classic", "alien"], default="classic", help="Starting board configuration")
+    selfplay.add_argument("--seed", type=int, default=0, help="Seed of the first game")
+
+    tournament = subparsers.add_parser("tournament", help="Coordinate a round robin between player files")
+    tournament.add_argument("players", nargs="+", help="Player files, at the same path on every worker")
+    tournament.add_argument("-n", "--games", type=int, required=True, help="Number of games of each pair of players")
+    tournament.add_argument("-r", "--results", required=True, help="JSON lines results file, a run is resumed from it")
+    tournament.add_argument("-c", "--config", choices=["classic", "alien"], default="classic", help="Starting board configuration")
+    tournament.add_argument("-t", "--time-limit", type=float, default=TIME_LIMIT, help="Time credit of each player, in seconds")
+    tournament.add_argument("--seed", type=int, default=0, help="Seed of the first game of each pair")
+
+    worker = subparsers.add_parser("worker", help="Play the games handed out by a coordinator")
+    worker.add_argument("-j", "--processes", type=int, default=None, help="Number of games played at once")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log)
+
+    if args.mode == "worker":
+        jobs = asyncio.run(work(args.address, args.port, args.processes))
+        print(f"{jobs} jobs run")
+    elif args.mode == "selfplay":
+        settings = {"depth": args.depth, "random_plies": args.random_plies, "config": args.config, "seed": args.seed}
+        writer = ShardWriter(args.directory, args.shard_size, settings)
+        jobs = selfplay_jobs(writer, args.games, args.depth, args.random_plies, args.config, args.seed)
+        sink = SelfPlaySink(writer)
+        try:
+            finished = asyncio.run(Coordinator(jobs, sink, sink.skip).serve(args.address, args.port))
+        finally:
+            sink.commit()
+        print(f"{writer.games} games, {writer.manifest['positions']} positions in {len(writer.manifest['shards'])} "
+              f"shards, {writer.buffered} pending, {list(finished.values()).count(False)} failed")
+        sys.exit(1 if not all(finished.values()) else 0)
+    else:
+        results = ResultsFile(args.results)
+        jobs = tournament_jobs(args.players, args.games, args.config, args.seed, args.time_limit, results.done)
+        finished = asyncio.run(Coordinator(jobs, results).serve(args.address, args.port))
+        print(f"{len(results.done)} games in {args.results}, {list(finished.values()).count(False)} failed")
+        sys.exit(1 if not all(finished.values()) else 0)
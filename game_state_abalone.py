@@ -1,6 +1,6 @@
 import copy
 import json
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
 
 from board_abalone import BoardAbalone
 from player_abalone import PlayerAbalone
@@ -20,13 +20,18 @@ class GameStateAbalone(GameState):
         next_player (Player): Next player to play.
         players (list[Player]): List of players.
         rep (Representation): Representation of the game.
+        serialize_legal_moves (bool): Whether `to_json` lists the legal moves, for the GUI to highlight them. Off by
+            default, since it generates every move of each serialized state.
     """
 
+    serialize_legal_moves = False
+
     def __init__(self, scores: Dict, next_player: Player, players: List[Player], rep: BoardAbalone, step: int, *args, **kwargs) -> None:
         super().__init__(scores, next_player, players, rep)
         self.max_score = -6
         self.max_step = 50
         self.step = step
+        self._legal_moves = None
 
     def get_step(self) -> int:
         """
@@ -119,16 +124,14 @@ class GameStateAbalone(GameState):
             if player.get_id() == pid:
                 return player
 
-    def generator(self):
+    def generate_moves(self) -> Iterator[Tuple[List[Tuple[int, int]], int, int]]:
         """
-        Generate possible actions.
+        Generate the legal moves of the next player, without applying them.
 
         Returns:
-            Set[Action]: List of possible future representations.
+            Iterator[Tuple[List[Tuple[int, int]], int, int]]: pieces moved by each move, with the direction of the move
         """
-        current_rep = self.get_rep()
-        b = current_rep.get_env()
-        d = current_rep.get_dimensions()
+        b = self.get_rep().get_env()
         for i, j in list(b.keys()):
             p = b.get((i, j), None)
             if p.get_owner_id() == self.next_player.get_id():
@@ -136,104 +139,198 @@ class GameStateAbalone(GameState):
                 for n_i, n_j in list_index:
                     to_move_pieces = self.detect_conflict(i, j, n_i, n_j)
                     if to_move_pieces is not None:
-                        copy_b = copy.copy(b)
-                        id_add = None
-                        pop_piece = None
-                        for k in range(len(to_move_pieces)):
-                            n_index = to_move_pieces[k]
-                            if (
-                                n_index[0] + n_i >= 0
-                                and n_index[0] + n_i < d[0]
-                                and n_index[1] + n_j >= 0
-                                and n_index[1] + n_j < d[1]
-                                and self.in_hexa((n_index[0] + n_i, n_index[1] + n_j))
-                            ):
-                                copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)] = Piece(
-                                    piece_type=copy_b[(n_index[0], n_index[1])].get_type(),
-                                    owner=self.get_player_id(copy_b[(n_index[0], n_index[1])].get_owner_id()),
-                                )
-                                copy_b.pop((n_index[0], n_index[1]))
-                            else:
-                                id_add = copy_b[(n_index[0], n_index[1])].get_owner_id()
-                                pop_piece = (n_index[0], n_index[1])
-                                copy_b.pop((n_index[0], n_index[1]))
-                        for k in range(len(to_move_pieces)):
-                            n_index = to_move_pieces[k]
-                            if pop_piece != (n_index[0], n_index[1]):
-                                copy_b[(n_index[0] + n_i, n_index[1] + n_j)] = copy.copy(
-                                    copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)]
-                                )
-                                copy_b.pop((n_index[0] + n_i, n_index[1] + n_j, 1))
-                        yield BoardAbalone(env=copy_b, dim=d), id_add
-
-    def generate_possible_actions(self) -> Set[Action]:
+                        yield to_move_pieces, n_i, n_j
+
+    def move_changes(self, to_move_pieces: List[Tuple[int, int]], n_i: int, n_j: int) -> FrozenSet[Tuple[Tuple[int, int], Optional[str]]]:
+        """
+        Compute the cells whose content is changed by a move.
+
+        Args:
+            to_move_pieces (List[Tuple[int, int]]): the pieces to move, as returned by `detect_conflict`
+            n_i (int): Row direction of movement.
+            n_j (int): Column direction of movement.
+
+        Returns:
+            FrozenSet[Tuple[Tuple[int, int], Optional[str]]]: the changed cells, with the type of the piece they hold after the move
+        """
+        b = self.get_rep().get_env()
+        d = self.get_rep().get_dimensions()
+        after = dict.fromkeys(to_move_pieces)
+        for k, l in to_move_pieces:
+            if 0 <= k + n_i < d[0] and 0 <= l + n_j < d[1] and self.in_hexa((k + n_i, l + n_j)):
+                after[(k + n_i, l + n_j)] = b[(k, l)].get_type()
+        return frozenset((c, t) for c, t in after.items() if (b[c].get_type() if c in b else None) != t)
+
+    def ejected_piece(self, to_move_pieces: List[Tuple[int, int]], n_i: int, n_j: int) -> Optional[Piece]:
+        """
+        Find the piece pushed off the board by a move, without applying it.
+
+        Args:
+            to_move_pieces (List[Tuple[int, int]]): the pieces to move, as returned by `detect_conflict`
+            n_i (int): Row direction of movement.
+            n_j (int): Column direction of movement.
+
+        Returns:
+            Piece: the piece pushed off the board, None if the move keeps every piece on the board
+        """
+        d = self.get_rep().get_dimensions()
+        k, l = to_move_pieces[-1]
+        if 0 <= k + n_i < d[0] and 0 <= l + n_j < d[1] and self.in_hexa((k + n_i, l + n_j)):
+            return None
+        return self.get_rep().get_env()[(k, l)]
+
+    def get_legal_moves(self) -> Dict[Tuple[Tuple[int, int], Tuple[int, int]], "LazyAction"]:
+        """
+        Return the index of the legal moves of the next player, built on the first call.
+
+        Pieces of a same type are interchangeable, so pushing one's own pieces off the board in
+        different ways can lead to the same board: such moves share a single action.
+
+        Returns:
+            Dict[Tuple[Tuple[int, int], Tuple[int, int]], LazyAction]: the action of each (from-cell, direction) pair
+        """
+        if self._legal_moves is None:
+            self._legal_moves = {}
+            actions = {}
+            for move in self.generate_moves():
+                to_move_pieces, n_i, n_j = move
+                changes = self.move_changes(*move)
+                if changes not in actions:
+                    actions[changes] = LazyAction(self, move)
+                self._legal_moves[(to_move_pieces[0], (n_i, n_j))] = actions[changes]
+        return self._legal_moves
+
+    def move_pieces(self, to_move_pieces: List[Tuple[int, int]], n_i: int, n_j: int) -> Tuple[BoardAbalone, Optional[int]]:
+        """
+        Compute the board obtained by moving pieces in a given direction.
+
+        Args:
+            to_move_pieces (List[Tuple[int, int]]): the pieces to move, as returned by `detect_conflict`
+            n_i (int): Row direction of movement.
+            n_j (int): Column direction of movement.
+
+        Returns:
+            Tuple[BoardAbalone, Optional[int]]: the new board and the ID of the owner of the piece pushed off the board, if any
+        """
+        current_rep = self.get_rep()
+        b = current_rep.get_env()
+        d = current_rep.get_dimensions()
+        copy_b = copy.copy(b)
+        id_add = None
+        pop_piece = None
+        for k in range(len(to_move_pieces)):
+            n_index = to_move_pieces[k]
+            if (
+                n_index[0] + n_i >= 0
+                and n_index[0] + n_i < d[0]
+                and n_index[1] + n_j >= 0
+                and n_index[1] + n_j < d[1]
+                and self.in_hexa((n_index[0] + n_i, n_index[1] + n_j))
+            ):
+                copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)] = Piece(
+                    piece_type=copy_b[(n_index[0], n_index[1])].get_type(),
+                    owner=self.get_player_id(copy_b[(n_index[0], n_index[1])].get_owner_id()),
+                )
+                copy_b.pop((n_index[0], n_index[1]))
+            else:
+                id_add = copy_b[(n_index[0], n_index[1])].get_owner_id()
+                pop_piece = (n_index[0], n_index[1])
+                copy_b.pop((n_index[0], n_index[1]))
+        for k in range(len(to_move_pieces)):
+            n_index = to_move_pieces[k]
+            if pop_piece != (n_index[0], n_index[1]):
+                copy_b[(n_index[0] + n_i, n_index[1] + n_j)] = copy.copy(
+                    copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)]
+                )
+                copy_b.pop((n_index[0] + n_i, n_index[1] + n_j, 1))
+        return BoardAbalone(env=copy_b, dim=d), id_add
+
+    def apply_move(self, to_move_pieces: List[Tuple[int, int]], n_i: int, n_j: int) -> "GameStateAbalone":
+        """
+        Compute the game state obtained by playing a move.
+
+        Args:
+            to_move_pieces (List[Tuple[int, int]]): the pieces to move, as returned by `detect_conflict`
+            n_i (int): Row direction of movement.
+            n_j (int): Column direction of movement.
+
+        Returns:
+            GameStateAbalone: the next game state
+        """
+        next_rep, id_add = self.move_pieces(to_move_pieces, n_i, n_j)
+        return GameStateAbalone(
+            self.compute_scores(id_add=id_add),
+            self.compute_next_player(),
+            self.players,
+            next_rep,
+            step=self.step + 1,
+        )
+
+    def generator(self):
+        """
+        Generate possible actions.
+
+        Returns:
+            Set[Action]: List of possible future representations.
+        """
+        for to_move_pieces, n_i, n_j in self.generate_moves():
+            yield self.move_pieces(to_move_pieces, n_i, n_j)
+
+    def get_possible_actions(self) -> "PossibleActions":
+        """
+        Return the possible actions from this state, generated on the first call.
+
+        Returns:
+            PossibleActions: The possible actions, in generation order.
+        """
+        if self.is_done():
+            return PossibleActions()
+        if self._possible_actions is None:
+            self._possible_actions = self.generate_possible_actions()
+        return self._possible_actions
+
+    def generate_possible_actions(self) -> "PossibleActions":
         """
         Generate possible actions for the current game state.
 
+        The next game state of each action is only computed when it is first requested.
+
         Returns:
-            List[Action]: List of possible actions.
-        """
-        poss_actions = {
-            Action(
-                self,
-                GameStateAbalone(
-                    self.compute_scores(id_add=id_add),
-                    self.compute_next_player(),
-                    self.players,
-                    valid_next_rep,
-                    step=self.step + 1,
-                ),
-            )
-            for valid_next_rep, id_add in self.generator()
-        }
-        return poss_actions
+            PossibleActions: The possible actions, in generation order.
+        """
+        return PossibleActions({id(action): action for action in self.get_legal_moves().values()}.values())
 
     def convert_light_action_to_action(self,data) ->  Action :
+        """
+        Convert a move given as {"from": cell, "to": neighbouring cell} into an action.
+
+        Args:
+            data: the light action
+
+        Returns:
+            Action: the corresponding possible action, None if the move is not legal
+        """
         src,dst=data["from"],data["to"]
-        current_game_state = self
-        b = current_game_state.get_rep().get_env()
-        d = current_game_state.get_rep().get_dimensions()
-        n_i, n_j = dst[0]-src[0],dst[1]-src[1]
-        to_move_pieces = current_game_state.detect_conflict(src[0],src[1],n_i,n_j)
-        if to_move_pieces is not None:
-            copy_b = copy.copy(b)
-            id_add = None
-            pop_piece = None
-            for k in range(len(to_move_pieces)):
-                n_index = to_move_pieces[k]
-                if (
-                    n_index[0] + n_i >= 0
-                    and n_index[0] + n_i < d[0]
-                    and n_index[1] + n_j >= 0
-                    and n_index[1] + n_j < d[1]
-                    and current_game_state.in_hexa((n_index[0] + n_i, n_index[1] + n_j))
-                ):
-                    copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)] = Piece(
-                        piece_type=copy_b[(n_index[0], n_index[1])].get_type(),
-                        owner=current_game_state.get_player_id(copy_b[(n_index[0], n_index[1])].get_owner_id()),
-                    )
-                    copy_b.pop((n_index[0], n_index[1]))
-                else:
-                    id_add = copy_b[(n_index[0], n_index[1])].get_owner_id()
-                    pop_piece = (n_index[0], n_index[1])
-                    copy_b.pop((n_index[0], n_index[1]))
-            for k in range(len(to_move_pieces)):
-                n_index = to_move_pieces[k]
-                if pop_piece != (n_index[0], n_index[1]):
-                    copy_b[(n_index[0] + n_i, n_index[1] + n_j)] = copy.copy(
-                        copy_b[(n_index[0] + n_i, n_index[1] + n_j, 1)]
-                    )
-                    copy_b.pop((n_index[0] + n_i, n_index[1] + n_j, 1))
-            return Action(
-                    current_game_state,
-                    GameStateAbalone(
-                        current_game_state.compute_scores(id_add=id_add),
-                        current_game_state.compute_next_player(),
-                        current_game_state.players,
-                        BoardAbalone(env=copy_b, dim=d),
-                        step=current_game_state.step + 1,
-                        ),
-                    )
+        return self.get_legal_moves().get(((src[0], src[1]), (dst[0]-src[0], dst[1]-src[1])))
+
+    def convert_board_to_action(self, piece_types: Dict[Tuple[int, int], str]) -> Optional["LazyAction"]:
+        """
+        Find the possible action leading to a board, for moves received from another process or machine.
+
+        Args:
+            piece_types (Dict[Tuple[int, int], str]): the piece type of each occupied cell of the board after the move
+
+        Returns:
+            LazyAction: the action leading to this board, None if no possible action does
+        """
+        b = self.get_rep().get_env()
+        changes = frozenset(
+            (c, piece_types.get(c)) for c in set(b) | set(piece_types)
+            if (b[c].get_type() if c in b else None) != piece_types.get(c)
+        )
+        for action in self.get_possible_actions():
+            if self.move_changes(*action.move) == changes:
+                return action
         return None
 
     def compute_scores(self, id_add: int) -> Dict[int, float]:
@@ -253,16 +350,115 @@ class GameStateAbalone(GameState):
         # TODO print(scores)
         return scores
 
+    def compute_winner_ids(self, scores: Optional[Dict[int, float]] = None) -> List[int]:
+        """
+        Compute the IDs of the players winning on this state.
+
+        Ties on the scores are broken by the total distance of each player's pieces
+        to the centre of the board, the closest player winning.
+
+        Args:
+            scores (Dict[int, float], optional): scores to rank, defaults to the scores of the state
+
+        Returns:
+            List[int]: IDs of the winning players, more than one in case of a draw
+        """
+        scores = self.scores if scores is None else scores
+        max_val = max(scores.values())
+        players_id = list(filter(lambda key: scores[key] == max_val, scores))
+        if len(players_id) > 1:
+            env = self.get_rep().get_env()
+            dim = self.get_rep().get_dimensions()
+            dist = dict.fromkeys(players_id, 0)
+            center = (dim[0]//2, dim[1]//2)
+            for i, j in list(env.keys()):
+                p = env.get((i, j), None)
+                if p.get_owner_id():
+                    dist[p.get_owner_id()] += BoardAbalone.manhattan_distance(center, (i, j))
+            min_dist = min(dist.values())
+            players_id = list(filter(lambda key: dist[key] == min_dist, dist))
+        return players_id
+
     def __str__(self) -> str:
         if not self.is_done():
             return super().__str__()
         return "The game is finished!"
 
     def to_json(self) -> str:
-        return { i:j for i,j in self.__dict__.items() if i!="_possible_actions"}
+        json_state = { i:j for i,j in self.__dict__.items() if i not in ("_possible_actions", "_legal_moves")}
+        if self.serialize_legal_moves and self.next_player is not None and not self.is_done():
+            json_state["legal_moves"] = [
+                {"from": src, "to": (src[0] + n_i, src[1] + n_j)} for src, (n_i, n_j) in self.get_legal_moves()
+            ]
+        return json_state
 
     @classmethod
     def from_json(cls,data:str,*,next_player:Optional[PlayerAbalone]=None) -> Serializable:
         d = json.loads(data)
         return cls(**{**d,"scores":{int(k):v for k,v in d["scores"].items()},"players":[PlayerAbalone.from_json(json.dumps(x)) if not isinstance(x,str) else next_player for x in d["players"]],"next_player":next_player,"rep":BoardAbalone.from_json(json.dumps(d["rep"]))})
 
+
+
+class LazyAction(Action):
+    """
+    An action whose next game state is only computed when it is first requested.
+
+    Attributes:
+        current_game_state (GameStateAbalone): The state the action is played from.
+        move (Tuple[List[Tuple[int, int]], int, int]): The pieces moved by the action and the direction of the move.
+        score (float): The value of the next game state computed ahead by a search, None if there is none.
+    """
+
+    __slots__ = ("move", "_parent", "_next_game_state", "score")
+
+    def __init__(self, current_game_state: GameStateAbalone, move: Tuple[List[Tuple[int, int]], int, int]) -> None:
+        self.move = move
+        self._parent = current_game_state
+        self._next_game_state = None
+        self.score = None
+        super().__init__(current_game_state, None)
+
+    @property
+    def next_game_state(self) -> GameStateAbalone:
+        if self._next_game_state is None:
+            self._next_game_state = self._parent.apply_move(*self.move)
+        return self._next_game_state
+
+    @next_game_state.setter
+    def next_game_state(self, value: Optional[GameStateAbalone]) -> None:
+        self._next_game_state = value
+
+    def is_computed(self) -> bool:
+        """
+        Check if the next game state has already been computed.
+
+        Returns:
+            bool: True if the next game state is available, False otherwise.
+        """
+        return self._next_game_state is not None
+
+    def get_ejected_piece(self) -> Optional[Piece]:
+        """
+        Get the piece pushed off the board by the action, without computing the next game state.
+
+        Returns:
+            Piece: the piece pushed off the board, None if the action keeps every piece on the board
+        """
+        return self._parent.ejected_piece(*self.move)
+
+    def to_json(self) -> dict:
+        return {"current_game_state": self.current_game_state, "next_game_state": self.get_next_game_state()}
+
+
+class PossibleActions(tuple):
+    """
+    The ordered possible actions of a game state.
+
+    Membership is first tested by identity, so that checking an action taken from the collection
+    does not compute the next game state of every other action.
+    """
+
+    def __contains__(self, action: Any) -> bool:
+        if not isinstance(action, Action):
+            return False
+        return any(action is a for a in self) or super().__contains__(action)
@@ -0,0 +1,112 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+HEADLESS_MODULES = ("board_abalone", "player_abalone", "game_state_abalone", "my_player", "playout_abalone",
+                    "main_abalone")
+DEFERRED_MODULES = ("socketio", "engineio", "aiohttp", "seahorse.game.io_stream", "seahorse.game.master",
+                    "seahorse.player.proxies", "seahorse.utils.gui_client", "seahorse.utils.recorders")
+DEFAULT_BUDGET_MS = 250
+# A headless local game between random players, whose run time is mostly startup.
+HEADLESS_GAME = ("main_abalone.py", "-t", "local", "random_player_abalone.py", "random_player_abalone.py", "-g",
+                 "-l", "INFO")
+DEFAULT_GAME_BUDGET_MS = 1000
+REPEAT = 5
+
+
+def measure_import(module: str) -> Tuple[float, Set[str]]:
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module (str): name of the module to import
+
+    Returns:
+        Tuple[float, Set[str]]: cumulative import time of the module in milliseconds, and the modules it loaded
+    """
+    cumulative = parse_import_times(run_importtime(["-c", f"import {module}"]))
+    return cumulative[module], set(cumulative)
+
+
+def measure_headless_game() -> Tuple[float, Set[str]]:
+    """
+    Run `main_abalone.py -t local -g` between random players in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        Tuple[float, Set[str]]: run time of the whole command in milliseconds, and the modules it loaded
+    """
+    start = time.perf_counter()
+    stderr = run_importtime(list(HEADLESS_GAME))
+    return (time.perf_counter() - start) * 1000, set(parse_import_times(stderr))
+
+
+def run_importtime(arguments: List[str]) -> str:
+    completed = subprocess.run([sys.executable, "-X", "importtime", *arguments],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                               check=True)
+    return completed.stderr
+
+
+def parse_import_times(stderr: str) -> Dict[str, float]:
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, total, name = line.split("|")
+        if total.strip().isdigit():
+            cumulative[name.strip()] = int(total) / 1000
+    return cumulative
+
+
+def benchmark(modules: List[str], repeat: int = REPEAT) -> Dict[str, Tuple[float, List[str]]]:
+    """
+    Measure the import time of modules and list the deferred modules they load.
+
+    Args:
+        modules (List[str]): modules to measure
+        repeat (int, optional): number of measures per module, the fastest is kept
+
+    Returns:
+        Dict[str, Tuple[float, List[str]]]: best import time in milliseconds and loaded deferred modules of each module
+    """
+    results = {}
+    for module in modules:
+        times = []
+        loaded = set()
+        for _ in range(repeat):
+            elapsed, names = measure_import(module)
+            times.append(elapsed)
+            loaded |= names
+        results[module] = (min(times), sorted(loaded.intersection(DEFERRED_MODULES)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="import_time_abalone.py",
+                                     description="Checks that the engine and runner modules load quickly and "
+                                                 "without the networking/GUI stack.")
+    parser.add_argument("modules", nargs="*", default=list(HEADLESS_MODULES), help="Modules to measure")
+    parser.add_argument("-b", "--budget", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum import time of each module, in milliseconds")
+    parser.add_argument("-n", "--repeat", type=int, default=REPEAT, help="Measures per module, the fastest is kept")
+    parser.add_argument("-g", "--game-budget", type=float, default=DEFAULT_GAME_BUDGET_MS,
+                        help="Maximum run time of a headless local game between random players, in milliseconds")
+    args = parser.parse_args()
+
+    results = benchmark(args.modules, args.repeat)
+    game = min((measure_headless_game() for _ in range(args.repeat)), key=lambda measure: measure[0])
+    results["local -g game"] = (game[0], sorted(game[1].intersection(DEFERRED_MODULES)))
+    failures = 0
+    for module, (elapsed, deferred) in results.items():
+        budget = args.game_budget if module == "local -g game" else args.budget
+        status = "ok"
+        if deferred:
+            status = "loads " + ", ".join(deferred)
+        elif elapsed > budget:
+            status = f"over budget ({budget:.0f} ms)"
+        failures += status != "ok"
+        print(f"{module:<20} {elapsed:8.1f} ms  {status}")
+    sys.exit(1 if failures else 0)
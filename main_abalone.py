@@ -2,82 +2,97 @@ import argparse
 import asyncio
 import os
 from os.path import basename, splitext, dirname
-import platform
 import sys
 
 from loguru import logger
 from board_abalone import BoardAbalone
 from player_abalone import PlayerAbalone
-from master_abalone import MasterAbalone
 from game_state_abalone import GameStateAbalone
-from seahorse.player.proxies import InteractivePlayerProxy, LocalPlayerProxy, RemotePlayerProxy
-from seahorse.utils.gui_client import GUIClient
-from seahorse.utils.recorders import StateRecorder
 from seahorse.game.game_layout.board import Piece
-from seahorse.utils.custom_exceptions import PlayerDuplicateError
+from seahorse.utils.custom_exceptions import ActionNotPermittedError, PlayerDuplicateError, SeahorseTimeoutError
 from argparse import RawTextHelpFormatter
 
-def play(player1, player2, log_level, port, address, gui, record, gui_path, config) :
-    list_players = [player1, player2]
+# The game master, the proxies, the GUI client and the recorders pull in the socket stack (socketio, aiohttp):
+# they are imported by the functions and modes that use them, so that importing this module stays cheap.
+
+BOARD_DIM = [17, 9]
+# 0 case non accessible
+# 1 case player 1
+# 2 case player 2
+# 3 case vide accessible
+CLASSIC_LAYOUT = [ # CLASSIQUE
+    [0, 0, 0, 0, 1, 0, 0, 0, 0],
+    [0, 0, 0, 1, 0, 1, 0, 0, 0],
+    [0, 0, 1, 0, 1, 0, 3, 0, 0],
+    [0, 1, 0, 1, 0, 3, 0, 3, 0],
+    [1, 0, 1, 0, 1, 0, 3, 0, 3],
+    [0, 1, 0, 1, 0, 3, 0, 3, 0],
+    [1, 0, 1, 0, 3, 0, 3, 0, 3],
+    [0, 3, 0, 3, 0, 3, 0, 3, 0],
+    [3, 0, 3, 0, 3, 0, 3, 0, 3],
+    [0, 3, 0, 3, 0, 3, 0, 3, 0],
+    [3, 0, 3, 0, 3, 0, 2, 0, 2],
+    [0, 3, 0, 3, 0, 2, 0, 2, 0],
+    [3, 0, 3, 0, 2, 0, 2, 0, 2],
+    [0, 3, 0, 3, 0, 2, 0, 2, 0],
+    [0, 0, 3, 0, 2, 0, 2, 0, 0],
+    [0, 0, 0, 2, 0, 2, 0, 0, 0],
+    [0, 0, 0, 0, 2, 0, 0, 0, 0],
+]
+ALIEN_LAYOUT = [ # ALIEN
+    [0, 0, 0, 0, 2, 0, 0, 0, 0],
+    [0, 0, 0, 3, 0, 3, 0, 0, 0],
+    [0, 0, 2, 0, 2, 0, 3, 0, 0],
+    [0, 3, 0, 1, 0, 2, 0, 3, 0],
+    [2, 0, 1, 0, 1, 0, 3, 0, 3],
+    [0, 2, 0, 2, 0, 3, 0, 3, 0],
+    [3, 0, 1, 0, 2, 0, 3, 0, 3],
+    [0, 2, 0, 2, 0, 3, 0, 3, 0],
+    [3, 0, 3, 0, 3, 0, 3, 0, 3],
+    [0, 3, 0, 3, 0, 1, 0, 1, 0],
+    [3, 0, 3, 0, 1, 0, 2, 0, 3],
+    [0, 3, 0, 3, 0, 1, 0, 1, 0],
+    [3, 0, 3, 0, 2, 0, 2, 0, 1],
+    [0, 3, 0, 1, 0, 2, 0, 3, 0],
+    [0, 0, 3, 0, 1, 0, 1, 0, 0],
+    [0, 0, 0, 3, 0, 3, 0, 0, 0],
+    [0, 0, 0, 0, 1, 0, 0, 0, 0],
+]
+
+
+def build_initial_state(player1, player2, config) -> GameStateAbalone:
+    """
+    Build the starting game state of a match.
+
+    Args:
+        player1 (PlayerAbalone): first player, who moves first
+        player2 (PlayerAbalone): second player
+        config (str): starting board configuration, "classic" or "alien"
+
+    Returns:
+        GameStateAbalone: the initial game state
+    """
     init_scores = {player1.get_id(): 0, player2.get_id(): 0}
-    dim = [17, 9]
     env = {}
-    # 0 case non accessible
-    # 1 case player 1
-    # 2 case player 2
-    # 3 case vide accessible
-    classic = [ # CLASSIQUE
-        [0, 0, 0, 0, 1, 0, 0, 0, 0],
-        [0, 0, 0, 1, 0, 1, 0, 0, 0],
-        [0, 0, 1, 0, 1, 0, 3, 0, 0],
-        [0, 1, 0, 1, 0, 3, 0, 3, 0],
-        [1, 0, 1, 0, 1, 0, 3, 0, 3],
-        [0, 1, 0, 1, 0, 3, 0, 3, 0],
-        [1, 0, 1, 0, 3, 0, 3, 0, 3],
-        [0, 3, 0, 3, 0, 3, 0, 3, 0],
-        [3, 0, 3, 0, 3, 0, 3, 0, 3],
-        [0, 3, 0, 3, 0, 3, 0, 3, 0],
-        [3, 0, 3, 0, 3, 0, 2, 0, 2],
-        [0, 3, 0, 3, 0, 2, 0, 2, 0],
-        [3, 0, 3, 0, 2, 0, 2, 0, 2],
-        [0, 3, 0, 3, 0, 2, 0, 2, 0],
-        [0, 0, 3, 0, 2, 0, 2, 0, 0],
-        [0, 0, 0, 2, 0, 2, 0, 0, 0],
-        [0, 0, 0, 0, 2, 0, 0, 0, 0],
-    ]
-    alien = [ # ALIEN
-            [0, 0, 0, 0, 2, 0, 0, 0, 0],
-            [0, 0, 0, 3, 0, 3, 0, 0, 0],
-            [0, 0, 2, 0, 2, 0, 3, 0, 0],
-            [0, 3, 0, 1, 0, 2, 0, 3, 0],
-            [2, 0, 1, 0, 1, 0, 3, 0, 3],
-            [0, 2, 0, 2, 0, 3, 0, 3, 0],
-            [3, 0, 1, 0, 2, 0, 3, 0, 3],
-            [0, 2, 0, 2, 0, 3, 0, 3, 0],
-            [3, 0, 3, 0, 3, 0, 3, 0, 3],
-            [0, 3, 0, 3, 0, 1, 0, 1, 0],
-            [3, 0, 3, 0, 1, 0, 2, 0, 3],
-            [0, 3, 0, 3, 0, 1, 0, 1, 0],
-            [3, 0, 3, 0, 2, 0, 2, 0, 1],
-            [0, 3, 0, 1, 0, 2, 0, 3, 0],
-            [0, 0, 3, 0, 1, 0, 1, 0, 0],
-            [0, 0, 0, 3, 0, 3, 0, 0, 0],
-            [0, 0, 0, 0, 1, 0, 0, 0, 0],
-        ]
-    
-    initial_board = classic if config=='classic' else alien
+    initial_board = CLASSIC_LAYOUT if config == 'classic' else ALIEN_LAYOUT
     W = 1
     B = 2
-    for i in range(dim[0]):
-        for j in range(dim[1]):
+    for i in range(BOARD_DIM[0]):
+        for j in range(BOARD_DIM[1]):
             if initial_board[i][j] == W:
                 env[(i, j)] = Piece(piece_type=player1.get_piece_type(), owner=player1)
             elif initial_board[i][j] == B:
                 env[(i, j)] = Piece(piece_type=player2.get_piece_type(), owner=player2)
 
-    init_rep = BoardAbalone(env=env, dim=dim)
-    initial_game_state = GameStateAbalone(
-        scores=init_scores, next_player=player1, players=list_players, rep=init_rep, step=0)
+    init_rep = BoardAbalone(env=env, dim=BOARD_DIM)
+    return GameStateAbalone(
+        scores=init_scores, next_player=player1, players=[player1, player2], rep=init_rep, step=0)
+
+def play(player1, player2, log_level, port, address, gui, record, gui_path, config) :
+    from master_abalone import MasterAbalone
+
+    list_players = [player1, player2]
+    initial_game_state = build_initial_state(player1, player2, config)
     try:
         master = MasterAbalone(
             name="Abalone", initial_game_state=initial_game_state, players_iterator=list_players, log_level=log_level, port=port,
@@ -86,11 +101,105 @@ def play(player1, player2, log_level, port, address, gui, record, gui_path, conf
     except PlayerDuplicateError:
         return
 
-    listeners = [GUIClient(path=gui_path)]*gui
+    listeners = []
+    if gui :
+        from seahorse.utils.gui_client import GUIClient
+        listeners = [GUIClient(path=gui_path)]*gui
     if record :
+        from seahorse.utils.recorders import StateRecorder
         listeners.append(StateRecorder())
     master.record_game(listeners=listeners)
 
+def play_headless(player1, player2, log_level, record, config) :
+    """
+    Play a game without GUI in this process, with the rules of the game master (time credits, legality checks,
+    forfeit on error) but without its socket server, so that neither socketio nor aiohttp is loaded.
+
+    Args:
+        player1 (PlayerAbalone): first player, who moves first
+        player2 (PlayerAbalone): second player
+        log_level (str): logging level
+        record (bool): whether the successive game states are written to a `__REC__<timestamp>.json` file
+        config (str): starting board configuration, "classic" or "alien"
+
+    Returns:
+        List[PlayerAbalone]: the winner(s) of the game
+    """
+    import json
+    import time
+
+    logger.remove()
+    logger.add(sys.stderr, level=log_level)
+    if player1.get_name() == player2.get_name():
+        logger.error("Multiple players have the same name this is not allowed.")
+        return []
+    state = build_initial_state(player1, player2, config)
+    records = []
+    scores = None
+    for player in state.get_players():
+        logger.info(f"Player : {player.get_name()} - {player.get_id()}")
+    while True:
+        if record:
+            records.append(json.loads(json.dumps(state.to_json(), default=lambda x: x.to_json())))
+        if state.is_done():
+            break
+        player = state.get_next_player()
+        logger.info(f"Player now playing : {player.get_name()} - {player.get_id()}")
+        try:
+            player.start_timer()
+            try:
+                action = player.play(state)
+            finally:
+                player.stop_timer()
+            if action not in state.get_possible_actions():
+                raise ActionNotPermittedError()
+        except (ActionNotPermittedError, SeahorseTimeoutError) as e:
+            logger.error(f"{type(e).__name__} for player {player.get_name()}, who forfeits")
+            scores = {player_id: score for player_id, score in state.get_scores().items() if player_id != player.get_id()}
+            break
+        state = action.get_next_game_state()
+        logger.info(f"Current game state: \n{state.get_rep()}")
+
+    winner_ids = state.compute_winner_ids(scores)
+    for key, score in state.get_scores().items():
+        logger.info(f"{key} - {score}")
+    winners = [player for player in state.get_players() if player.get_id() in winner_ids]
+    for player in winners:
+        logger.info(f"Winner - {player.get_name()}")
+    if record:
+        with open(f"__REC__{int(time.time() * 1000000)}.json", "w") as f:
+            json.dump(records, f)
+    return winners
+
+def connect_player(player_class, time_limit, prepare=lambda player: player) :
+    """
+    Wrap a player for the `connect` mode. It plays "B", the seat of the remote player of `host_game`, unless the
+    game it joins gives it another colour in `update_id`, as the `server` mode does: it is then replaced by a new
+    player of that colour, since a player derives its opponent and its tables from its piece type.
+
+    Args:
+        player_class (type): MyPlayer class of the player file
+        time_limit (float): time credit of the player, in seconds
+        prepare (Callable, optional): applied to each player created, e.g. to profile it
+
+    Returns:
+        LocalPlayerProxy: the proxy to connect
+    """
+    import json
+    from seahorse.player.proxies import LocalPlayerProxy
+
+    proxy = LocalPlayerProxy(prepare(player_class("B", name="_remote", time_limit=time_limit)), gs=GameStateAbalone)
+
+    @proxy.sio.on("update_id")
+    async def update_seat(data):
+        seat = json.loads(data)
+        piece_type = seat.get("piece_type", proxy.wrapped_player.get_piece_type())
+        if piece_type != proxy.wrapped_player.get_piece_type():
+            proxy.wrapped_player = prepare(player_class(piece_type, name="_remote", time_limit=time_limit))
+        proxy.wrapped_player.id = seat["new_id"]
+
+    return proxy
+
 if __name__=="__main__":
 
     parser = argparse.ArgumentParser(
@@ -106,13 +215,14 @@ if __name__=="__main__":
     parser.add_argument("-t","--type",
                         required=True,
                         type=str, 
-                        choices=["local", "host_game", "connect", "human_vs_computer", "human_vs_human"],
+                        choices=["local", "host_game", "connect", "human_vs_computer", "human_vs_human", "server"],
                         help="\nThe execution mode you want.\n" 
                              +" - local: Runs everything on you machine\n"
                              +" - host_game: Runs a single player on your machine and waits for an opponent to connect with the 'connect' node.\n\t      You must provide an external ip for the -a argument (use 'ipconfig').\n"
                              +" - connect: Runs a single player and connects to a distant game launched with the 'host' at the hostname specified with '-a'.\n"
                              +" - human_vs_computer: Launches a GUI locally for you to challenge your player.\n"
                              +" - human_vs_human: Launches a GUI locally for you to experiment the game's mechanics.\n"
+                             +" - server: Hosts concurrent matches between players launched with 'connect' at the hostname specified with '-a'.\n\t  If a player is given, each connecting player plays against it instead.\n"
                              +"\n"
                         )
     parser.add_argument("-c","--config",required=False,choices=["classic","alien"], default="classic",help="\nSets the starting board configuration.")
@@ -121,6 +231,11 @@ if __name__=="__main__":
     parser.add_argument("-g","--no-gui",action='store_false',default=True, help="Headless mode\n\n")
     parser.add_argument("-r","--record",action="store_true",default=False, help="Stores the succesive game states in a json file.\n\n")
     parser.add_argument("-l","--log",required=False,choices=["DEBUG","INFO"], default="DEBUG",help="\nSets the logging level.")
+    parser.add_argument("-m","--max-matches",required=False,type=int, default=16, help="Maximum number of concurrent matches in server mode.\n\n")
+    parser.add_argument("--results",required=False, default=None, help="Appends the result of each match to this file in server mode.\n\n")
+    parser.add_argument("--profile",required=False, default=None, help="Samples the moves of the local players and writes their\ncollapsed stacks and summaries to this directory.\n\n")
+    parser.add_argument("--profile-steps",required=False,type=lambda s: [int(x) for x in s.split(",")], default=None, help="Comma-separated steps of the moves to profile (e.g. 0,20,40), every move by default.\n\n")
+    parser.add_argument("--profile-top",required=False,type=int, default=15, help="Number of functions of each profile summary.\n\n")
     parser.add_argument("players_list",nargs="*", help='The players')
     args=parser.parse_args()
 
@@ -136,6 +251,19 @@ if __name__=="__main__":
 
     gui_path = os.path.join(dirname(os.path.abspath(__file__)),'GUI','index.html')
 
+    profiler = None
+    if args.profile:
+        from profiler_abalone import MoveProfiler
+        profiler = MoveProfiler(args.profile, steps=args.profile_steps, top=args.profile_top)
+
+    def profiled(player):
+        if profiler is not None:
+            profiler.profile(player)
+        return player
+
+    # Only the GUI needs the legal moves of the states it is sent.
+    GameStateAbalone.serialize_legal_moves = type in ("host_game", "human_vs_computer", "human_vs_human") or (type == "local" and bool(gui))
+
     if type == "local" :
         folder = dirname(list_players[0])
         sys.path.append(folder)
@@ -143,14 +271,18 @@ if __name__=="__main__":
         folder = dirname(list_players[1])
         sys.path.append(folder)
         player2_class = __import__(splitext(basename(list_players[1]))[0], fromlist=[None])
-        player1 = player1_class.MyPlayer("W", name=splitext(basename(list_players[0]))[0]+"_1", time_limit=time_limit)
-        player2 = player2_class.MyPlayer("B", name=splitext(basename(list_players[1]))[0]+"_2", time_limit=time_limit)
-        play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=gui, record=record, gui_path=gui_path, config=base_config)
+        player1 = profiled(player1_class.MyPlayer("W", name=splitext(basename(list_players[0]))[0]+"_1", time_limit=time_limit))
+        player2 = profiled(player2_class.MyPlayer("B", name=splitext(basename(list_players[1]))[0]+"_2", time_limit=time_limit))
+        if gui :
+            play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=gui, record=record, gui_path=gui_path, config=base_config)
+        else :
+            play_headless(player1=player1, player2=player2, log_level=log_level, record=record, config=base_config)
     elif type == "host_game" :
+        from seahorse.player.proxies import LocalPlayerProxy, RemotePlayerProxy
         folder = dirname(list_players[0])
         sys.path.append(folder)
         player1_class = __import__(splitext(basename(list_players[0]))[0], fromlist=[None])
-        player1 = LocalPlayerProxy(player1_class.MyPlayer("W", name=splitext(basename(list_players[0]))[0]+"_local", time_limit=time_limit),gs=GameStateAbalone)
+        player1 = LocalPlayerProxy(profiled(player1_class.MyPlayer("W", name=splitext(basename(list_players[0]))[0]+"_local", time_limit=time_limit)),gs=GameStateAbalone)
         player2 = RemotePlayerProxy(mimics=PlayerAbalone,piece_type="B",name="_remote", time_limit=time_limit)
         if address=='localhost':
             logger.warning('Using `localhost` with `host_game` mode, if both players are on different machines')
@@ -160,21 +292,30 @@ if __name__=="__main__":
         folder = dirname(list_players[0])
         sys.path.append(folder)
         player2_class = __import__(splitext(basename(list_players[0]))[0], fromlist=[None])
-        player2 = LocalPlayerProxy(player2_class.MyPlayer("B", name="_remote", time_limit=time_limit),gs=GameStateAbalone)
+        player2 = connect_player(player2_class.MyPlayer, time_limit, prepare=profiled)
         if address=='localhost':
             logger.warning('Using `localhost` with `connect` mode, if both players are on different machines')
             logger.warning('use ipconfig/ifconfig to get your external ip and specity the ip with -a')
         asyncio.new_event_loop().run_until_complete(player2.listen(keep_alive=True,master_address=f"http://{address}:{port}"))
     elif type == "human_vs_computer" :
+        from seahorse.player.proxies import InteractivePlayerProxy, LocalPlayerProxy
         folder = dirname(list_players[0])
         sys.path.append(folder)
         player1_class = __import__(splitext(basename(list_players[0]))[0], fromlist=[None])
         player1 = InteractivePlayerProxy(PlayerAbalone("W", name="bob", time_limit=time_limit),gui_path=gui_path,gs=GameStateAbalone)
-        player2 = LocalPlayerProxy(player1_class.MyPlayer("B", name=splitext(basename(list_players[0]))[0], time_limit=time_limit),gs=GameStateAbalone)
+        player2 = LocalPlayerProxy(profiled(player1_class.MyPlayer("B", name=splitext(basename(list_players[0]))[0], time_limit=time_limit)),gs=GameStateAbalone)
         play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=False, record=record, gui_path=gui_path, config=base_config)
     elif type == "human_vs_human" :
+        from seahorse.player.proxies import InteractivePlayerProxy
         player1 = InteractivePlayerProxy(PlayerAbalone("W", name="bob", time_limit=time_limit),gui_path=gui_path,gs=GameStateAbalone)
         player2 = InteractivePlayerProxy(PlayerAbalone("B", name="alice", time_limit=time_limit))
         player2.share_sid(player1)
         play(player1=player1, player2=player2, log_level=log_level, port=port, address=address, gui=False, record=record, gui_path=gui_path, config=base_config)
-        
+    elif type == "server" :
+        from server_abalone import MatchServer
+        logger.remove()
+        logger.add(sys.stderr, level=log_level)
+        server = MatchServer(address, port, engine=list_players[0] if list_players else None,
+                             max_matches=vars(args).get("max_matches"), time_limit=time_limit, config=base_config,
+                             results_path=vars(args).get("results"))
+        asyncio.run(server.serve())
@@ -0,0 +1,190 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from game_state_abalone import GameStateAbalone
+from player_abalone import PlayerAbalone
+from playout_abalone import CELLS, DIRECTIONS, Move, Position
+from seahorse.game.action import Action
+
+EXPLORATION = 1.4
+TIME_SHARE = 0.8
+MAX_TIME_PER_MOVE = 60
+PROCESSES = os.cpu_count() or 1
+DEADLINE_CHECK_INTERVAL = 16
+
+_executor = None
+
+
+class Node:
+    """
+    A node of the search tree.
+
+    Attributes:
+        move (Move): move leading to the node from its parent
+        parent (Node): parent node, None for the root
+        player (int): player who played `move`
+        children (List[Node]): expanded children
+        untried (List[Move]): legal moves not expanded yet, None until the node is first reached
+        visits (int): number of playouts through the node
+        wins (float): wins of `player` over these playouts, draws counting for half
+    """
+
+    __slots__ = ("move", "parent", "player", "children", "untried", "visits", "wins")
+
+    def __init__(self, move: Optional[Move], parent: Optional["Node"], player: int) -> None:
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.
+
+    def select(self) -> "Node":
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda c: c.wins / c.visits + EXPLORATION * math.sqrt(log_visits / c.visits))
+
+
+def search(root_position: Position, deadline: float, seed: int) -> Tuple[Dict[Tuple[int, int], Tuple[int, float]], int]:
+    """
+    Run UCT from a position until the deadline.
+
+    Args:
+        root_position (Position): position to search from
+        deadline (float): time.time() at which the search stops
+        seed (int): seed of the playouts
+
+    Returns:
+        Tuple[Dict[Tuple[int, int], Tuple[int, float]], int]: visits and wins of each root move, and the number of playouts
+    """
+    rng = random.Random(seed)
+    root = Node(None, None, 3 - root_position.to_move)
+    playouts = 0
+    while playouts % DEADLINE_CHECK_INTERVAL or time.time() < deadline:
+        node = root
+        position = root_position.copy()
+        while True:
+            if node.untried is None:
+                node.untried = [] if position.is_done() else position.legal_moves()
+                rng.shuffle(node.untried)
+            if node.untried or not node.children:
+                break
+            node = node.select()
+            position.play(*node.move)
+        if node.untried:
+            move = node.untried.pop()
+            child = Node(move, node, position.to_move)
+            node.children.append(child)
+            position.play(*move)
+            node = child
+        winner = position.playout(rng)
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+        playouts += 1
+    return {child.move[:2]: (child.visits, child.wins) for child in root.children}, playouts
+
+
+def get_executor(processes: int) -> ProcessPoolExecutor:
+    """
+    Return the process pool running the searches, created on the first call and reused afterwards.
+
+    Args:
+        processes (int): number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: the pool
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(processes)
+    return _executor
+
+
+def parallel_search(position: Position, budget: float, processes: int = PROCESSES) -> Tuple[Dict[Tuple[int, int], Tuple[int, float]], int]:
+    """
+    Run independent searches in several processes and merge the statistics of their root moves.
+
+    Args:
+        position (Position): position to search from
+        budget (float): search time in seconds
+        processes (int, optional): number of searches to run in parallel
+
+    Returns:
+        Tuple[Dict[Tuple[int, int], Tuple[int, float]], int]: visits and wins of each root move, and the number of playouts
+    """
+    deadline = time.time() + budget
+    seeds = [random.getrandbits(32) for _ in range(processes)]
+    if processes == 1:
+        results = [search(position, deadline, seeds[0])]
+    else:
+        executor = get_executor(processes)
+        results = [future.result() for future in [executor.submit(search, position, deadline, seed) for seed in seeds]]
+    statistics = {}
+    for root_statistics, _ in results:
+        for move, (visits, wins) in root_statistics.items():
+            total_visits, total_wins = statistics.get(move, (0, 0.))
+            statistics[move] = (total_visits + visits, total_wins + wins)
+    return statistics, sum(playouts for _, playouts in results)
+
+
+class MyPlayer(PlayerAbalone):
+    """
+    Player class for Abalone game using Monte Carlo Tree Search.
+
+    Attributes:
+        piece_type (str): piece type of the player
+        processes (int): number of parallel searches
+    """
+
+    def __init__(self, piece_type: str, name: str = "bob", time_limit: float = 60 * 15, *args) -> None:
+        """
+        Initialize the PlayerAbalone instance.
+
+        Args:
+            piece_type (str): Type of the player's game piece
+            name (str, optional): Name of the player (default is "bob")
+            time_limit (float, optional): the time limit in (s)
+        """
+        super().__init__(piece_type, name, time_limit, *args)
+        self.processes = PROCESSES
+
+    def compute_action(self, current_state: GameStateAbalone, **kwargs) -> Action:
+        """
+        Function to implement the logic of the player.
+
+        Args:
+            current_state (GameState): Current game state representation
+            **kwargs: Additional keyword arguments
+
+        Returns:
+            Action: selected feasible action
+        """
+        statistics, _ = parallel_search(Position.from_state(current_state), self.move_time(current_state), self.processes)
+        legal_moves = current_state.get_legal_moves()
+        if not statistics:
+            return next(iter(legal_moves.values()))
+        cell, direction = max(statistics, key=lambda move: statistics[move][0])
+        return legal_moves[(CELLS[cell], DIRECTIONS[direction])]
+
+    def move_time(self, state: GameStateAbalone) -> float:
+        """
+        Share the remaining time between the remaining moves of the player.
+
+        Args:
+            state (GameStateAbalone): the current state
+
+        Returns:
+            float: the time to spend on this move, in seconds
+        """
+        moves_left = max(1, (state.max_step - state.get_step() + 1) // 2)
+        return min(MAX_TIME_PER_MOVE, TIME_SHARE * self.get_remaining_time() / moves_left)
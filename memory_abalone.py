@@ -0,0 +1,85 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from loguru import logger
+
+from bench_abalone import SUITE_FILE, load_suite, notation_to_state
+from my_player import CUTOFF_DEPTH, MyPlayer
+
+MAX_PEAK_MB = 16.
+MAX_NODE_BYTES = 512.
+
+
+def measure_decision(notation: str, depth: int) -> dict:
+    """
+    Measure the memory allocated by a search of a position with `tracemalloc`.
+
+    The retained memory is what the search leaves allocated while the position and the player are still alive, as
+    they are between two moves of a game: the transposition table and anything the position keeps of the search.
+
+    Args:
+        notation (str): the position
+        depth (int): cutoff depth of the search
+
+    Returns:
+        dict: peak and retained bytes, nodes visited, transposition table entries and retained bytes per node
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        players = [MyPlayer("W", "memory_1"), MyPlayer("B", "memory_2")]
+        state = notation_to_state(notation, players)
+        player = state.get_next_player()
+        player.cutoff = depth
+        player.current_step = state.get_step()
+        gc.collect()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        player.minimax_search(state)
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    nodes = player.statistics["nodes"]
+    return {
+        "peak": peak - baseline,
+        "retained": retained - baseline,
+        "nodes": nodes,
+        "entries": len(player.transposition_table.hash_table),
+        "node_bytes": (retained - baseline) / max(nodes, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="memory_abalone.py",
+                                     description="Measures the peak and retained memory of a MyPlayer decision on "
+                                                 "the positions of a benchmark suite.")
+    parser.add_argument("-s", "--suite", default=SUITE_FILE, help="Suite file, one 'name notation' line per position")
+    parser.add_argument("-d", "--depth", type=int, default=CUTOFF_DEPTH, help="Cutoff depth of the searches")
+    parser.add_argument("-k", "--only", nargs="*", default=None, help="Names of the positions to search")
+    parser.add_argument("--max-peak", type=float, default=MAX_PEAK_MB,
+                        help="Maximum peak memory of a decision, in megabytes")
+    parser.add_argument("--max-node-bytes", type=float, default=MAX_NODE_BYTES,
+                        help="Maximum memory retained per visited node, in bytes")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    suite = load_suite(args.suite)
+    if args.only:
+        suite = {name: suite[name] for name in args.only}
+    failures = 0
+    for name, notation in suite.items():
+        result = measure_decision(notation, args.depth)
+        status = "ok"
+        if result["peak"] > args.max_peak * 2 ** 20:
+            status = f"peak over budget ({args.max_peak:.0f} MB)"
+        elif result["node_bytes"] > args.max_node_bytes:
+            status = f"retained over budget ({args.max_node_bytes:.0f} B/node)"
+        failures += status != "ok"
+        print(f"{name:<16} {result['peak'] / 2 ** 20:8.2f} MB peak {result['retained'] / 2 ** 20:8.2f} MB retained "
+              f"{result['nodes']:7d} nodes {result['entries']:7d} entries {result['node_bytes']:8.0f} B/node  {status}")
+    sys.exit(1 if failures else 0)
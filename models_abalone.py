@@ -0,0 +1,183 @@
+import abc
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+from evaluation_abalone import Evaluator
+from game_state_abalone import GameStateAbalone, LazyAction
+from playout_abalone import CELL_INDEX, CELLS
+
+INPUT_SIZE = 2 * len(CELLS)
+
+
+def encode_states(states: List[GameStateAbalone], piece_type: str) -> np.ndarray:
+    """
+    Encode positions as the inputs of the models: one column per cell for the pieces of the player, then one column
+    per cell for the pieces of the opponent.
+
+    Args:
+        states (List[GameStateAbalone]): the positions
+        piece_type (str): piece type of the player the evaluation is for
+
+    Returns:
+        np.ndarray: a (len(states), INPUT_SIZE) float32 matrix of zeros and ones
+    """
+    inputs = np.zeros((len(states), INPUT_SIZE), dtype=np.float32)
+    for row, state in enumerate(states):
+        for cell, piece in state.get_rep().get_env().items():
+            inputs[row, CELL_INDEX[cell] + (0 if piece.get_type() == piece_type else len(CELLS))] = 1
+    return inputs
+
+
+def encode_children(state: GameStateAbalone, actions: List[LazyAction], piece_type: str) -> np.ndarray:
+    """
+    Encode a position and the positions its actions lead to, by moving the pieces of each action on a copy of the
+    position's inputs rather than computing the next game states.
+
+    Args:
+        state (GameStateAbalone): the position
+        actions (List[LazyAction]): actions of the position
+        piece_type (str): piece type of the player the evaluation is for
+
+    Returns:
+        np.ndarray: a (len(actions) + 1, INPUT_SIZE) float32 matrix, the position then each next position
+    """
+    inputs = np.repeat(encode_states([state], piece_type), len(actions) + 1, axis=0)
+    env = state.get_rep().get_env()
+    for row, action in enumerate(actions, 1):
+        to_move_pieces, n_i, n_j = action.move
+        # From the front of the pushed line, so that each piece lands on a cell already vacated.
+        for i, j in reversed(to_move_pieces):
+            offset = 0 if env[(i, j)].get_type() == piece_type else len(CELLS)
+            inputs[row, CELL_INDEX[(i, j)] + offset] = 0
+            destination = CELL_INDEX.get((i + n_i, j + n_j))
+            if destination is not None:
+                inputs[row, destination + offset] = 1
+    return inputs
+
+
+def encode_boards(boards: np.ndarray, to_move: np.ndarray) -> np.ndarray:
+    """
+    Encode the positions of self-play shards like `encode_states`, for the player to move.
+
+    Args:
+        boards (np.ndarray): the cells of each position in the order of CELLS, 0 empty, 1 first player, 2 second player
+        to_move (np.ndarray): the player to move in each position, 1 or 2
+
+    Returns:
+        np.ndarray: a (len(boards), INPUT_SIZE) float32 matrix of zeros and ones
+    """
+    to_move = to_move.reshape(-1, 1)
+    own = boards == to_move
+    other = (boards != 0) & ~own
+    return np.concatenate([own, other], axis=1).astype(np.float32)
+
+
+class ModelEvaluator(Evaluator):
+    """
+    Evaluation by a model of the encoded position, batched over the children of a node.
+    """
+
+    batched = True
+
+    @abc.abstractmethod
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        Run the model.
+
+        Args:
+            inputs (np.ndarray): encoded positions, a (batch, INPUT_SIZE) float32 matrix
+
+        Returns:
+            np.ndarray: value of each position
+        """
+
+    def evaluate(self, states: List[GameStateAbalone], piece_type: str) -> List[float]:
+        return self.predict(encode_states(states, piece_type)).tolist()
+
+    def evaluate_children(self, state: GameStateAbalone, actions: List[LazyAction],
+                          piece_type: str) -> Tuple[float, List[float]]:
+        scores = self.predict(encode_children(state, actions, piece_type)).tolist()
+        return scores[0], scores[1:]
+
+
+class LinearEvaluator(ModelEvaluator):
+    """
+    Linear model of the encoded position.
+
+    Attributes:
+        weights (np.ndarray): weight of each input, of shape (INPUT_SIZE,)
+        bias (float): constant term
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float = 0., futility_margin: float = math.inf) -> None:
+        if weights.shape != (INPUT_SIZE,):
+            raise ValueError(f"A linear model needs {INPUT_SIZE} weights, not {weights.shape}")
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.futility_margin = futility_margin
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        return inputs @ self.weights + self.bias
+
+
+class MLPEvaluator(ModelEvaluator):
+    """
+    Multi-layer perceptron of the encoded position, with ReLU hidden layers and a linear output.
+
+    Attributes:
+        layers (List[Tuple[np.ndarray, np.ndarray]]): weight matrix and bias of each layer, the last one having
+            a single output
+    """
+
+    def __init__(self, layers: List[tuple], futility_margin: float = math.inf) -> None:
+        if layers[0][0].shape[0] != INPUT_SIZE or layers[-1][0].shape[1] != 1:
+            raise ValueError(f"An MLP needs {INPUT_SIZE} inputs and one output")
+        self.layers = [(weights.astype(np.float32), bias.astype(np.float32)) for weights, bias in layers]
+        self.futility_margin = futility_margin
+
+    def predict(self, inputs: np.ndarray) -> np.ndarray:
+        activations = inputs
+        for weights, bias in self.layers[:-1]:
+            activations = np.maximum(activations @ weights + bias, 0)
+        weights, bias = self.layers[-1]
+        return (activations @ weights + bias)[:, 0]
+
+
+def load_model(path: str) -> Evaluator:
+    """
+    Load a model from a .npz file.
+
+    A linear model holds `weights` (INPUT_SIZE values) and optionally `bias`; an MLP holds `w1`, `b1`, `w2`, `b2`...
+    for each layer, the last one having a single output. Either may hold `futility_margin`, a bound on the change
+    of value caused by a move that captures no piece, without which futility pruning is disabled.
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        Evaluator: the model
+    """
+    with np.load(path) as data:
+        futility_margin = float(data["futility_margin"]) if "futility_margin" in data else math.inf
+        if "weights" in data:
+            return LinearEvaluator(data["weights"], float(data["bias"]) if "bias" in data else 0., futility_margin)
+        layers = []
+        while f"w{len(layers) + 1}" in data:
+            layers.append((data[f"w{len(layers) + 1}"], data[f"b{len(layers) + 1}"]))
+        if not layers:
+            raise ValueError(f"{path} holds neither a linear model nor an MLP")
+        return MLPEvaluator(layers, futility_margin)
+
+
+def save_linear(path: str, weights: np.ndarray, bias: float = 0., futility_margin: float = math.inf) -> None:
+    np.savez(path, weights=weights, bias=bias, futility_margin=futility_margin)
+
+
+def save_mlp(path: str, layers: List[tuple], futility_margin: float = math.inf) -> None:
+    arrays = {}
+    for index, (weights, bias) in enumerate(layers, 1):
+        arrays[f"w{index}"] = weights
+        arrays[f"b{index}"] = bias
+    np.savez(path, futility_margin=futility_margin, **arrays)
@@ -3,17 +3,21 @@ import math
 import random
 
 from typing import List, Union, Tuple, Optional
+from endgame_abalone import DRAW, SOLVER_PLIES, EndgameSolver
+from evaluation_abalone import load_evaluator
 from game_state_abalone import GameStateAbalone
 from player_abalone import PlayerAbalone
+from playout_abalone import CELLS, DIRECTIONS, Position
 from seahorse.game.action import Action
 
 CUTOFF_DEPTH = 2
+MAX_EXTENSIONS = 1
+LATE_MOVE_INDEX = 6
+LATE_MOVE_REDUCTION = 1
+WIN_SCORE = 10 ** 9
 INFINITY = math.inf
-CENTER = (8, 4)
 MAX_LINE_LENGTH = 9
 NB_PIECE_COLORS = 2
-COORDINATES_IN_SAME_ROW = [((-1, -1), (1, 1)), ((-2, 0), (2, 0)), ((-1, 1), (1, -1))]
-DEEPER_SEARCH_CUTOFF = 44
 
 
 class MyPlayer(PlayerAbalone):
@@ -22,6 +26,9 @@ class MyPlayer(PlayerAbalone):
 
     Attributes:
         piece_type (str): piece type of the player
+        cutoff (int): depth beyond which positions are evaluated by the heuristic, before extensions and reductions
+        statistics (dict): counters of the searches of the player, "nodes" the number of nodes visited
+        evaluator (Evaluator): evaluation of the positions at the cutoff depth
     """
 
     def __init__(self, piece_type: str, name: str = "bob", time_limit: float = 60 * 15, *args) -> None:
@@ -36,7 +43,13 @@ class MyPlayer(PlayerAbalone):
         super().__init__(piece_type, name, time_limit, *args)
         self.other_player = 'W' if self.get_piece_type() == 'B' else 'B'
         self.transposition_table = TranspositionTable()
+        self.endgame_solver = EndgameSolver()
         self.current_step = 0
+        self.cutoff = CUTOFF_DEPTH
+        # Counted in a dict: every attribute assignment on a player checks (and logs) its timer.
+        self.statistics = {"nodes": 0}
+        self.evaluator = load_evaluator()
+        self.futility_margin = self.evaluator.futility_margin
 
     def compute_action(self, current_state: GameStateAbalone, **kwargs) -> Action:
         """
@@ -50,32 +63,70 @@ class MyPlayer(PlayerAbalone):
             Action: selected feasible action
         """
         self.current_step = current_state.get_step()
+        action = self.solve_endgame(current_state)
+        if action is not None:
+            return action
         score, action = self.minimax_search(current_state)
         return action
 
+    def solve_endgame(self, state: GameStateAbalone) -> Optional[Action]:
+        """
+        Search the last plies of the game exactly, down to the final outcome.
+
+        Args:
+            state (GameStateAbalone): the current state
+
+        Returns:
+            Optional[Action]: a move securing a win or a draw, None if the end is too far, the solver ran out of
+            nodes or every move loses, the heuristic search then choosing the move
+        """
+        if state.max_step - state.get_step() > SOLVER_PLIES:
+            return None
+        solved = self.endgame_solver.solve(Position.from_state(state))
+        if solved is None or solved[0] < DRAW:
+            return None
+        cell, direction, _ = solved[1]
+        return state.get_legal_moves()[(CELLS[cell], DIRECTIONS[direction])]
+
     def minimax_search(self, initial_state: GameStateAbalone) -> Tuple[float, Action]:
-        return self.max_value(initial_state, -INFINITY, INFINITY, 0)
+        return self.max_value(initial_state, -INFINITY, INFINITY, 0, self.cutoff)
 
-    def max_value(self, state: GameStateAbalone, alpha: float, beta: float, depth: int) -> Tuple[float, Optional[Action]]:
+    def max_value(self, state: GameStateAbalone, alpha: float, beta: float, depth: int, limit: int,
+                  last_action: Optional[Action] = None) -> Tuple[float, Optional[Action]]:
+        self.statistics["nodes"] += 1
         if state.is_done():
-            return state.get_scores().get(self.id), None
+            return self.terminal_value(state), None
 
         hash = self.transposition_table.compute_hash(state.get_rep().get_grid())
-        if hash in self.transposition_table.hash_table and self.transposition_table.hash_table[hash]['depth'] <= depth:
-            return self.transposition_table.hash_table[hash]['score'], self.transposition_table.hash_table[hash][
-                'action']
+        entry = self.transposition_table.probe(hash, state)
+        if entry is not None and entry[2] >= limit - depth:
+            return entry[0], entry[1]
 
-        if self.cutoff_depth(depth):
-            return self.heuristic(state), None
+        if self.cutoff_depth(depth, limit):
+            return self.heuristic(state, last_action), None
 
         score = -INFINITY
         action = None
-
-        actions = state.get_possible_actions() if state.get_step() <= 10 else self.get_sorted_actions(state, True)
-
-        for new_action in actions:
+        # Futility pruning: at the last ply, quiet moves cannot raise a hopeless static evaluation above alpha.
+        actions = self.get_sorted_actions(state)
+        static_score = self.evaluate_frontier(state, actions, depth, limit)
+        futile = static_score is not None and static_score + self.futility_margin <= alpha
+        pruned = False
+
+        for index, new_action in enumerate(actions):
+            capture = self.is_capture(state, new_action)
+            if futile and not capture:
+                pruned = True
+                continue
             new_state = new_action.get_next_game_state()
-            new_score, _ = self.min_value(new_state, alpha, beta, depth + 1)
+            new_limit = self.child_limit(new_state, capture, limit)
+            if self.is_late_move(index, capture, depth, limit, new_limit):
+                new_score, _ = self.min_value(new_state, alpha, beta, depth + 1, new_limit - LATE_MOVE_REDUCTION,
+                                              new_action)
+                if new_score > alpha:
+                    new_score, _ = self.min_value(new_state, alpha, beta, depth + 1, new_limit, new_action)
+            else:
+                new_score, _ = self.min_value(new_state, alpha, beta, depth + 1, new_limit, new_action)
 
             if new_score > score:
                 score = new_score
@@ -84,30 +135,49 @@ class MyPlayer(PlayerAbalone):
 
             if score >= beta:
                 break
+        self.release_children(actions)
 
-        self.transposition_table.record(hash, score, action, depth)
+        if action is None and pruned:
+            return static_score, None
+        if not pruned:
+            self.transposition_table.record(hash, score, action, limit - depth)
         return score, action
 
-    def min_value(self, state: GameStateAbalone, alpha: float, beta: float, depth: int) -> Tuple[float, Optional[Action]]:
+    def min_value(self, state: GameStateAbalone, alpha: float, beta: float, depth: int, limit: int,
+                  last_action: Optional[Action] = None) -> Tuple[float, Optional[Action]]:
+        self.statistics["nodes"] += 1
         if state.is_done():
-            return state.get_scores().get(self.id), None
+            return self.terminal_value(state), None
 
         hash = self.transposition_table.compute_hash(state.get_rep().get_grid())
-        if hash in self.transposition_table.hash_table and self.transposition_table.hash_table[hash]['depth'] <= depth:
-            return self.transposition_table.hash_table[hash]['score'], self.transposition_table.hash_table[hash][
-                'action']
+        entry = self.transposition_table.probe(hash, state)
+        if entry is not None and entry[2] >= limit - depth:
+            return entry[0], entry[1]
 
-        if self.cutoff_depth(depth):
-            return self.heuristic(state), None
+        if self.cutoff_depth(depth, limit):
+            return self.heuristic(state, last_action), None
 
         score = INFINITY
         action = None
-
-        actions = state.get_possible_actions() if state.get_step() <= 10 else self.get_sorted_actions(state, False)
-
-        for new_action in actions:
+        actions = self.get_sorted_actions(state)
+        static_score = self.evaluate_frontier(state, actions, depth, limit)
+        futile = static_score is not None and static_score - self.futility_margin >= beta
+        pruned = False
+
+        for index, new_action in enumerate(actions):
+            capture = self.is_capture(state, new_action)
+            if futile and not capture:
+                pruned = True
+                continue
             new_state = new_action.get_next_game_state()
-            new_score, _ = self.max_value(new_state, alpha, beta, depth + 1)
+            new_limit = self.child_limit(new_state, capture, limit)
+            if self.is_late_move(index, capture, depth, limit, new_limit):
+                new_score, _ = self.max_value(new_state, alpha, beta, depth + 1, new_limit - LATE_MOVE_REDUCTION,
+                                              new_action)
+                if new_score < beta:
+                    new_score, _ = self.max_value(new_state, alpha, beta, depth + 1, new_limit, new_action)
+            else:
+                new_score, _ = self.max_value(new_state, alpha, beta, depth + 1, new_limit, new_action)
 
             if new_score < score:
                 score = new_score
@@ -116,112 +186,154 @@ class MyPlayer(PlayerAbalone):
 
             if score <= alpha:
                 break
+        self.release_children(actions)
 
-        self.transposition_table.record(hash, score, action, depth)
+        if action is None and pruned:
+            return static_score, None
+        if not pruned:
+            self.transposition_table.record(hash, score, action, limit - depth)
         return score, action
 
-    def get_sorted_actions(self, state: GameStateAbalone, max_player: bool) -> List[Action]:
-        pieces_difference = self.pieces_alive(state, self.id) - self.pieces_alive(state, self.other_player)
+    def terminal_value(self, state: GameStateAbalone) -> float:
+        """
+        Value of a finished game: above any heuristic value for a win, below for a loss, 0 for a draw.
+
+        Args:
+            state (GameStateAbalone): the final state
 
-        actions = state.get_possible_actions()
+        Returns:
+            float: the value of the game for the player
+        """
+        winner_ids = state.compute_winner_ids()
+        if len(winner_ids) > 1:
+            return 0
+        return WIN_SCORE if self.id in winner_ids else -WIN_SCORE
 
-        larger_difference_actions = []
-        equal_difference_actions = []
-        lesser_difference_actions = []
+    def get_sorted_actions(self, state: GameStateAbalone) -> List[Action]:
+        """
+        Order the actions of the player to move: captures first, then quiet moves, then moves pushing one of its
+        own pieces off the board. The next game states are not computed.
 
-        for new_action in actions:
-            new_state = new_action.current_game_state
-            new_pieces_differences = self.pieces_alive(new_state, self.id) - self.pieces_alive(new_state,
-                                                                                               self.other_player)
-            if new_pieces_differences > pieces_difference:
-                larger_difference_actions.append(new_action)
-            elif new_pieces_differences == pieces_difference:
-                equal_difference_actions.append(new_action)
-            else:
-                lesser_difference_actions.append(new_action)
-        return larger_difference_actions + equal_difference_actions + lesser_difference_actions if max_player else \
-            lesser_difference_actions + equal_difference_actions + larger_difference_actions
+        Args:
+            state (GameStateAbalone): the state
 
-    def cutoff_depth(self, current_depth: int) -> bool:
-        return current_depth > (CUTOFF_DEPTH if self.current_step <= DEEPER_SEARCH_CUTOFF else CUTOFF_DEPTH + 1)
+        Returns:
+            List[Action]: the ordered actions
+        """
+        captures = []
+        quiet_actions = []
+        suicides = []
+
+        for new_action in state.get_possible_actions():
+            ejected = new_action.get_ejected_piece()
+            if ejected is None:
+                quiet_actions.append(new_action)
+            elif ejected.get_owner_id() == state.get_next_player().get_id():
+                suicides.append(new_action)
+            else:
+                captures.append(new_action)
+        return captures + quiet_actions + suicides
 
-    def heuristic(self, state: GameStateAbalone) -> float:
-        score = 0
-        score += self.distance_to_center_heuristic(state, self.other_player) - \
-                 self.distance_to_center_heuristic(state, self.piece_type)
+    def is_capture(self, state: GameStateAbalone, action: Action) -> bool:
+        ejected = action.get_ejected_piece()
+        return ejected is not None and ejected.get_owner_id() != state.get_next_player().get_id()
 
-        score += (self.pieces_alive(state, self.piece_type) - self.pieces_alive(state, self.other_player)) * 1000
+    def child_limit(self, new_state: GameStateAbalone, capture: bool, limit: int) -> int:
+        """
+        Extend the search by one ply after a capture or when a player is one piece away from losing.
 
-        score += (self.pieces_together_heuristic(state, self.piece_type) -
-                  self.pieces_together_heuristic(state, self.other_player))
+        Args:
+            new_state (GameStateAbalone): the state reached by the move
+            capture (bool): whether the move pushed an opponent piece off the board
+            limit (int): depth limit of the current node
 
-        score += (self.pieces_in_a_row_heuristic(state, self.piece_type) -
-                  self.pieces_in_a_row_heuristic(state, self.other_player))
+        Returns:
+            int: depth limit of the child node
+        """
+        if limit >= self.cutoff + MAX_EXTENSIONS:
+            return limit
+        if capture or min(new_state.get_scores().values()) <= new_state.max_score + 1:
+            return limit + 1
+        return limit
+
+    def is_late_move(self, index: int, capture: bool, depth: int, limit: int, new_limit: int) -> bool:
+        # Late move reductions: well-ordered nodes rarely need their late, quiet, unextended moves at full depth.
+        return index >= LATE_MOVE_INDEX and not capture and new_limit == limit and limit - depth > LATE_MOVE_REDUCTION
+
+    def is_frontier(self, depth: int, limit: int) -> bool:
+        return depth > 0 and depth == limit
+
+    def cutoff_depth(self, current_depth: int, limit: int) -> bool:
+        return current_depth > limit
+
+    def heuristic(self, state: GameStateAbalone, last_action: Optional[Action] = None) -> float:
+        # The action reaching the state keeps the value a batched evaluator computed ahead for it, if any.
+        score = getattr(last_action, "score", None)
+        if score is None:
+            score = self.evaluator.evaluate([state], self.piece_type)[0]
         return score
 
-    def distance_to_center_heuristic(self, state: GameStateAbalone, piece_type: str) -> float:
-        score = 0
-        for coordinate, piece in state.get_rep().env.items():
-            if piece.piece_type == piece_type:
-                score += self.euclidian_distance(coordinate, CENTER)
-        return score
+    def evaluate_frontier(self, state: GameStateAbalone, actions: List[Action], depth: int,
+                          limit: int) -> Optional[float]:
+        """
+        Evaluate a node at the depth limit for futility pruning. With a batched evaluator, its children, most of
+        which the search evaluates as leaves, are evaluated in the same call and their values kept on their actions
+        until then.
 
-    def pieces_together_heuristic(self, state: GameStateAbalone, piece_type: str) -> int:
-        number_of_pieces_around = 0
-        coordinates = {coordinate for coordinate, piece in state.get_rep().env.items() if
-                       piece.piece_type == piece_type}
-
-        for coordinate in coordinates:
-            for row_coordinates in COORDINATES_IN_SAME_ROW:
-                for coordinate_difference in row_coordinates:
-                    if (piece := state.get_rep().env.get(
-                            self.calculate_neighbor_coordinate(coordinate, coordinate_difference))) \
-                            and piece.piece_type == piece_type:
-                        number_of_pieces_around += 1
-        return number_of_pieces_around
-
-    def pieces_in_a_row_heuristic(self, state: GameStateAbalone, piece_type: str) -> float:
-        score = 0
-        coordinates = {coordinate for coordinate, piece in state.get_rep().env.items() if
-                       piece.piece_type == piece_type}
-
-        for coordinate in coordinates:
-            for row_coordinates in COORDINATES_IN_SAME_ROW:
-                coordinates_to_check = self.calculate_neighbor_coordinate(coordinate, row_coordinates[0]), \
-                                       self.calculate_neighbor_coordinate(coordinate, row_coordinates[1])
-
-                if coordinates_to_check[0] in coordinates and coordinates_to_check[1] in coordinates:
-                    score += 1
-                    outer_coordinates_to_check = self.calculate_neighbor_coordinate(coordinates_to_check[0],
-                                                                                    row_coordinates[0]), \
-                                                 self.calculate_neighbor_coordinate(coordinates_to_check[1],
-                                                                                    row_coordinates[1])
-
-                    if outer_coordinates_to_check[0] in coordinates or outer_coordinates_to_check[1] in coordinates:
-                        score -= 1
+        Args:
+            state (GameStateAbalone): the node
+            actions (List[Action]): the actions of the node
+            depth (int): depth of the node
+            limit (int): depth limit of the node
 
-        return score
+        Returns:
+            Optional[float]: value of the node, None if it is not at the frontier
+        """
+        if depth != limit:
+            return None
+        if self.evaluator.batched:
+            static_score, scores = self.evaluator.evaluate_children(state, actions, self.piece_type)
+            for action, score in zip(actions, scores):
+                action.score = score
+            return static_score if self.is_frontier(depth, limit) else None
+        return self.heuristic(state) if self.is_frontier(depth, limit) else None
+
+    def release_children(self, actions: List[Action]) -> None:
+        # A position keeps its actions and each action its next state: dropping the searched children keeps the
+        # position from holding the whole search tree once it has been searched. The values evaluated ahead are
+        # dropped too, the position being shared with the opponent, who evaluates it for its own piece type.
+        for action in actions:
+            action.next_game_state = None
+            action.score = None
+
+
+class TableEntry:
+    """
+    Entry of the transposition table.
 
-    def calculate_neighbor_coordinate(self, coordinate: Tuple[int, int], difference: Tuple[int, int]) -> Tuple[int, int]:
-        return coordinate[0] + difference[0], coordinate[1] + difference[1]
+    Attributes:
+        score (float): score of the position
+        move (tuple): (from-cell, direction) key of the best action in the legal moves of the position, None if
+            there is none, so that the table does not keep the action and the states it refers to alive
+        depth (int): depth searched below the position
+    """
 
-    def euclidian_distance(self, position1: Tuple[int, int], position2: Tuple[int, int]) -> float:
-        return ((position1[0] - position2[0]) ** 2 + (position1[1] - position2[1]) ** 2) ** 0.5
+    __slots__ = ("score", "move", "depth")
 
-    def pieces_alive(self, state: GameStateAbalone, piece_type: str) -> int:
-        score = 0
-        for piece in state.get_rep().env.values():
-            if piece.piece_type == piece_type:
-                score += 10
-        return score
+    def __init__(self, score: float, move: Optional[tuple], depth: int) -> None:
+        self.score = score
+        self.move = move
+        self.depth = depth
 
 
 class TranspositionTable:
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         self.hash_table = {}
+        # Tables shared between processes need the same keys in every process, hence a seed.
+        rng = random.Random(seed) if seed is not None else random
         self.zobrist_hash_keys = [
             [
-                [random.randint(1, 2 ** (MAX_LINE_LENGTH ** 2) - 1) for _ in range(NB_PIECE_COLORS)]
+                [rng.randint(1, 2 ** (MAX_LINE_LENGTH ** 2) - 1) for _ in range(NB_PIECE_COLORS)]
                 for _ in range(MAX_LINE_LENGTH)
             ]
             for _ in range(MAX_LINE_LENGTH)
@@ -247,13 +359,36 @@ class TranspositionTable:
 
         return hash
 
-    def record(self, hash: int, score: float, action: Action, depth: int):
-        if hash not in self.hash_table:
-            self.hash_table[hash] = {}
+    def probe(self, hash: int, state: GameStateAbalone) -> Optional[Tuple[float, Optional[Action], int]]:
+        """
+        Look up the entry of a position.
+
+        Args:
+            hash (int): hash of the position
+            state (GameStateAbalone): the position, whose legal moves give back the action of the entry
+
+        Returns:
+            Optional[Tuple[float, Optional[Action], int]]: score, best action and searched depth, None if the
+            position is not in the table
+        """
+        entry = self.hash_table.get(hash)
+        if entry is None:
+            return None
+        action = None if entry.move is None else state.get_legal_moves().get(entry.move)
+        return entry.score, action, entry.depth
 
-        self.hash_table[hash]['score'] = score
-        self.hash_table[hash]['action'] = action
-        self.hash_table[hash]['depth'] = depth
+    def record(self, hash: int, score: float, action: Action, depth: int):
+        move = None
+        if action is not None:
+            to_move_pieces, n_i, n_j = action.move
+            move = (to_move_pieces[0], (n_i, n_j))
+        entry = self.hash_table.get(hash)
+        if entry is None:
+            self.hash_table[hash] = TableEntry(score, move, depth)
+        else:
+            entry.score = score
+            entry.move = move
+            entry.depth = depth
 
     def to_json(self):
         return {}
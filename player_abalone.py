@@ -1,12 +1,8 @@
 from __future__ import annotations
 
-import copy
 import json
 from typing import TYPE_CHECKING
 
-from board_abalone import BoardAbalone
-from seahorse.game.action import Action
-from seahorse.game.game_layout.board import Piece
 from seahorse.player.player import Player
 from seahorse.utils.serializer import Serializable
 
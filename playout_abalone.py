@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import random
+from typing import List, Optional, Tuple
+
+from board_abalone import BoardAbalone
+from game_state_abalone import GameStateAbalone
+
+CELLS = sorted(cell for _, cell in BoardAbalone.GRID_POSITIONS)
+CELL_INDEX = {cell: index for index, cell in enumerate(CELLS)}
+DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1), (2, 0), (-2, 0)]
+NEIGHBOURS = [[CELL_INDEX.get((i + n_i, j + n_j), -1) for n_i, n_j in DIRECTIONS] for i, j in CELLS]
+CENTRE_DISTANCES = [BoardAbalone.manhattan_distance((8, 4), cell) for cell in CELLS]
+MAX_PIECES_IN_LINE = 3
+EMPTY = 0
+
+Move = Tuple[int, int, int]
+
+
+class Position:
+    """
+    A compact, mutable Abalone position used by playouts and exhaustive searches.
+
+    Moves are played and undone in place, no GameStateAbalone, BoardAbalone or Action is allocated.
+    The rules are those of GameStateAbalone: a move pushes a line of pieces one cell in one direction.
+
+    Attributes:
+        board (List[int]): content of each cell of CELLS, EMPTY, 1 for the first player or 2 for the second
+        scores (List[int]): score of the first and second player
+        to_move (int): player to move, 1 or 2
+        step (int): number of moves played since the start of the game
+        max_step (int): step at which the game ends
+        max_score (int): score at which the game ends
+    """
+
+    __slots__ = ("board", "scores", "to_move", "step", "max_step", "max_score")
+
+    def __init__(self, board: List[int], scores: List[int], to_move: int, step: int,
+                 max_step: int = 50, max_score: int = -6) -> None:
+        self.board = board
+        self.scores = scores
+        self.to_move = to_move
+        self.step = step
+        self.max_step = max_step
+        self.max_score = max_score
+
+    @classmethod
+    def from_state(cls, state: GameStateAbalone) -> Position:
+        """
+        Build the position of a game state, the first player of the state being player 1.
+
+        Args:
+            state (GameStateAbalone): the game state
+
+        Returns:
+            Position: the corresponding position
+        """
+        first_id = state.get_players()[0].get_id()
+        board = [EMPTY] * len(CELLS)
+        for cell, piece in state.get_rep().get_env().items():
+            board[CELL_INDEX[cell]] = 1 if piece.get_owner_id() == first_id else 2
+        scores = [int(state.get_scores()[player.get_id()]) for player in state.get_players()]
+        to_move = 1 if state.get_next_player().get_id() == first_id else 2
+        return cls(board, scores, to_move, state.get_step(), state.max_step, state.max_score)
+
+    def copy(self) -> Position:
+        return Position(self.board[:], self.scores[:], self.to_move, self.step, self.max_step, self.max_score)
+
+    def is_done(self) -> bool:
+        return self.step == self.max_step or self.max_score in self.scores
+
+    def line(self, cell: int, direction: int) -> int:
+        """
+        Return the number of pieces pushed by moving a piece in a direction, as `detect_conflict` does.
+
+        Args:
+            cell (int): index of the moved piece
+            direction (int): index of the direction in DIRECTIONS
+
+        Returns:
+            int: length of the pushed line, 0 if the move is not legal
+        """
+        board = self.board
+        me = self.to_move
+        if board[cell] != me:
+            return 0
+        my_count = 1
+        other_count = 0
+        length = 1
+        n = NEIGHBOURS[cell][direction]
+        while n >= 0 and board[n] != EMPTY:
+            if board[n] == me:
+                if other_count:
+                    return 0
+                my_count += 1
+                if my_count > MAX_PIECES_IN_LINE:
+                    return 0
+            else:
+                other_count += 1
+                if other_count >= my_count:
+                    return 0
+            length += 1
+            n = NEIGHBOURS[n][direction]
+        return length
+
+    def legal_moves(self) -> List[Move]:
+        """
+        Return the legal moves of the player to move.
+
+        Returns:
+            List[Move]: (cell, direction, length of the pushed line) of each move
+        """
+        moves = []
+        board = self.board
+        me = self.to_move
+        for cell in range(len(board)):
+            if board[cell] == me:
+                for direction in range(len(DIRECTIONS)):
+                    length = self.line(cell, direction)
+                    if length:
+                        moves.append((cell, direction, length))
+        return moves
+
+    def random_move(self, rng: random.Random) -> Optional[Move]:
+        """
+        Draw a legal move by sampling pieces and directions, which avoids generating every move.
+
+        Args:
+            rng (random.Random): random generator
+
+        Returns:
+            Optional[Move]: a legal move, None if the player to move cannot move
+        """
+        board = self.board
+        me = self.to_move
+        for _ in range(64):
+            cell = rng.randrange(len(board))
+            if board[cell] == me:
+                direction = rng.randrange(len(DIRECTIONS))
+                length = self.line(cell, direction)
+                if length:
+                    return cell, direction, length
+        moves = self.legal_moves()
+        return rng.choice(moves) if moves else None
+
+    def play(self, cell: int, direction: int, length: int) -> int:
+        """
+        Play a legal move in place.
+
+        Args:
+            cell (int): index of the moved piece
+            direction (int): index of the direction in DIRECTIONS
+            length (int): length of the pushed line, as returned by `line`
+
+        Returns:
+            int: the piece pushed off the board by the move, EMPTY if none, to be given back to `undo`
+        """
+        board = self.board
+        cells = [cell]
+        for _ in range(length - 1):
+            cells.append(NEIGHBOURS[cells[-1]][direction])
+        end = NEIGHBOURS[cells[-1]][direction]
+        ejected = EMPTY
+        if end < 0:
+            ejected = board[cells[-1]]
+            self.scores[ejected - 1] -= 1
+        else:
+            board[end] = board[cells[-1]]
+        for k in range(length - 1, 0, -1):
+            board[cells[k]] = board[cells[k - 1]]
+        board[cell] = EMPTY
+        self.to_move = 3 - self.to_move
+        self.step += 1
+        return ejected
+
+    def undo(self, cell: int, direction: int, length: int, ejected: int) -> None:
+        """
+        Undo a move played with `play`.
+
+        Args:
+            cell (int): index of the moved piece
+            direction (int): index of the direction in DIRECTIONS
+            length (int): length of the pushed line
+            ejected (int): the value returned by `play`
+        """
+        board = self.board
+        self.to_move = 3 - self.to_move
+        self.step -= 1
+        current = cell
+        for _ in range(length - 1):
+            following = NEIGHBOURS[current][direction]
+            board[current] = board[following]
+            current = following
+        end = NEIGHBOURS[current][direction]
+        if end < 0:
+            board[current] = ejected
+            self.scores[ejected - 1] += 1
+        else:
+            board[current] = board[end]
+            board[end] = EMPTY
+
+    def winner(self) -> int:
+        """
+        Return the winner with the rule of `GameStateAbalone.compute_winner_ids`.
+
+        Returns:
+            int: 1 or 2 for the winning player, 0 for a draw
+        """
+        if self.scores[0] != self.scores[1]:
+            return 1 if self.scores[0] > self.scores[1] else 2
+        distances = [0., 0., 0.]
+        for cell, value in enumerate(self.board):
+            distances[value] += CENTRE_DISTANCES[cell]
+        if distances[1] == distances[2]:
+            return 0
+        return 1 if distances[1] < distances[2] else 2
+
+    def playout(self, rng: random.Random) -> int:
+        """
+        Play random moves in place until the end of the game.
+
+        Args:
+            rng (random.Random): random generator
+
+        Returns:
+            int: the winner, as returned by `winner`
+        """
+        while not self.is_done():
+            move = self.random_move(rng)
+            if move is None:
+                break
+            self.play(*move)
+        return self.winner()
@@ -0,0 +1,199 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from player_abalone import PlayerAbalone
+from seahorse.game.action import Action
+
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 15
+
+Stack = Tuple[str, ...]
+
+
+class SamplingProfiler:
+    """
+    Sample the call stack of a thread at regular intervals from a background thread.
+
+    Sampling costs one stack walk per interval whatever the number of calls, so the profiled code runs at nearly
+    full speed. The samples are taken when the profiled thread releases the GIL, so the interval is at best the
+    switch interval of the interpreter (5 ms by default).
+
+    Attributes:
+        interval (float): time between two samples, in seconds
+        stacks (Counter): number of samples of each stack, from the outermost to the innermost function
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks = Counter()
+        self.labels = {}
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self, thread_id: Optional[int] = None) -> None:
+        """
+        Start sampling a thread.
+
+        Args:
+            thread_id (int, optional): identifier of the thread, the calling thread by default
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stopped.clear()
+        self.sampler = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+        self.sampler.start()
+
+    def stop(self) -> Counter:
+        """
+        Stop sampling.
+
+        Returns:
+            Counter: number of samples of each stack
+        """
+        self.stopped.set()
+        self.sampler.join()
+        return self.stacks
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self.stack(frame)] += 1
+
+    def stack(self, frame) -> Stack:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self.labels.get(code)
+            if label is None:
+                label = self.labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            labels.append(label)
+            frame = frame.f_back
+        return tuple(reversed(labels))
+
+
+def summarize(stacks: Counter, top: int = TOP_FUNCTIONS) -> List[Tuple[str, float, float]]:
+    """
+    Aggregate samples by function.
+
+    Args:
+        stacks (Counter): number of samples of each stack
+        top (int, optional): number of functions to keep
+
+    Returns:
+        List[Tuple[str, float, float]]: the functions with the most samples in their own code, with their share of
+        the samples in their own code (self) and in their own code or their callees (total)
+    """
+    total = sum(stacks.values()) or 1
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        # Recursive functions count once per sample.
+        for label in set(stack):
+            inclusive[label] += count
+    return [(label, count / total, inclusive[label] / total) for label, count in own.most_common(top)]
+
+
+def format_summary(title: str, stacks: Counter, top: int = TOP_FUNCTIONS) -> str:
+    lines = [f"{title}: {sum(stacks.values())} samples", "   self   total  function"]
+    for label, own, inclusive in summarize(stacks, top):
+        lines.append(f"{own:7.1%} {inclusive:7.1%}  {label}")
+    return "\n".join(lines)
+
+
+def write_collapsed(stacks: Counter, path: str) -> None:
+    """
+    Write samples in the collapsed stack format read by flamegraph.pl, speedscope or inferno: one line per stack,
+    its functions from the outermost separated by semicolons, then its number of samples.
+
+    Args:
+        stacks (Counter): number of samples of each stack
+        path (str): path of the file
+    """
+    with open(path, "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{';'.join(stack)} {count}\n")
+
+
+class MoveProfiler:
+    """
+    Profile the moves of players with a SamplingProfiler.
+
+    For each profiled move, the samples are written to `<player>-<step>.folded` and a summary of the functions with
+    the most samples is logged and appended to `summary.txt`. The samples of all the profiled moves of a player
+    are kept in `<player>.folded`, rewritten after each move.
+
+    Attributes:
+        directory (str): output directory
+        steps (set): steps of the moves to profile, None for every move
+        top (int): number of functions of each summary
+        interval (float): time between two samples, in seconds
+        games (Dict[str, Counter]): samples of the profiled moves of each player
+    """
+
+    def __init__(self, directory: str, steps: Optional[Iterable[int]] = None, top: int = TOP_FUNCTIONS,
+                 interval: float = SAMPLE_INTERVAL) -> None:
+        self.directory = directory
+        self.steps = set(steps) if steps else None
+        self.top = top
+        self.interval = interval
+        self.games: Dict[str, Counter] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def profile(self, player: PlayerAbalone) -> None:
+        """
+        Profile the moves of a player, by giving it a subclass of its class whose `compute_action` is sampled.
+
+        The class is changed rather than the method so that the player's attributes, sent to the GUI, stay the same.
+
+        Args:
+            player (PlayerAbalone): the player
+        """
+        base = type(player)
+        profiler = self
+
+        def compute_action(self, current_state, **kwargs) -> Action:
+            return profiler.profile_move(self.get_name(), current_state.get_step(),
+                                         lambda: base.compute_action(self, current_state=current_state, **kwargs))
+
+        object.__setattr__(player, "__class__", type(base.__name__, (base,), {"compute_action": compute_action}))
+
+    def profile_move(self, name: str, step: int, compute: Callable[[], Action]) -> Action:
+        """
+        Compute a move, sampled if its step is profiled.
+
+        Args:
+            name (str): name of the player
+            step (int): step of the move
+            compute (Callable[[], Action]): computation of the move
+
+        Returns:
+            Action: the action computed
+        """
+        if self.steps is not None and step not in self.steps:
+            return compute()
+        profiler = SamplingProfiler(self.interval)
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            return compute()
+        finally:
+            self.record(name, step, profiler.stop(), time.perf_counter() - start)
+
+    def record(self, name: str, step: int, stacks: Counter, elapsed: float) -> None:
+        prefix = os.path.join(self.directory, name)
+        write_collapsed(stacks, f"{prefix}-{step:03d}.folded")
+        game = self.games.setdefault(name, Counter())
+        game.update(stacks)
+        write_collapsed(game, f"{prefix}.folded")
+        summary = format_summary(f"{name}, step {step}, {elapsed:.2f} s", stacks, self.top)
+        logger.info("\n" + summary)
+        with open(os.path.join(self.directory, "summary.txt"), "a") as f:
+            f.write(summary + "\n\n")
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import random
+import sys
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from game_state_abalone import GameStateAbalone
+from main_abalone import build_initial_state
+from my_player import MyPlayer
+from playout_abalone import CELLS, Position
+from seahorse.game.action import Action
+
+MANIFEST_FILE = "manifest.json"
+SHARD_SIZE = 1 << 16
+SEARCH_DEPTH = 1
+RANDOM_PLIES = 8
+FIELDS = ("board", "to_move", "step", "score", "result")
+
+
+class SelfPlayPlayer(MyPlayer):
+    """
+    MyPlayer searching to a fixed depth, used to play and label the self-play games.
+
+    Attributes:
+        piece_type (str): piece type of the player
+        depth (int): number of plies searched before extensions and reductions
+    """
+
+    def __init__(self, piece_type: str, name: str = "selfplay", depth: int = SEARCH_DEPTH, *args) -> None:
+        """
+        Initialize the SelfPlayPlayer instance.
+
+        Args:
+            piece_type (str): Type of the player's game piece
+            name (str, optional): Name of the player
+            depth (int, optional): depth of the search
+        """
+        super().__init__(piece_type, name, *args)
+        self.depth = depth
+        self.cutoff = depth - 1
+
+
+def encode_state(state: GameStateAbalone) -> Position:
+    """
+    Encode a game state from its board cells, the first player being 1 and the second 2.
+
+    Args:
+        state (GameStateAbalone): the state to encode
+
+    Returns:
+        Position: the encoded position, whose board follows the order of CELLS
+    """
+    return Position.from_state(state)
+
+
+def safe_actions(state: GameStateAbalone) -> List[Action]:
+    """
+    Return the actions that do not push a piece of the player to move off the board.
+
+    Args:
+        state (GameStateAbalone): the current state
+
+    Returns:
+        List[Action]: the actions keeping the score of the player to move
+    """
+    player_id = state.get_next_player().get_id()
+    score = state.get_scores()[player_id]
+    return [action for action in state.get_possible_actions()
+            if action.get_next_game_state().get_scores()[player_id] == score]
+
+
+def play_game(seed: int, depth: int = SEARCH_DEPTH, random_plies: int = RANDOM_PLIES,
+              config: str = "classic") -> Dict[str, np.ndarray]:
+    """
+    Play a self-play game and label each of its positions.
+
+    Every position is searched; the first `random_plies` moves are drawn at random to diversify the games,
+    the following ones are the moves chosen by the search. Random moves never push one's own piece off the board. Games are reproducible from their seed.
+
+    Args:
+        seed (int): seed of the game
+        depth (int, optional): depth of the search
+        random_plies (int, optional): number of random moves at the start of the game
+        config (str, optional): starting board configuration
+
+    Returns:
+        Dict[str, np.ndarray]: one array per field of FIELDS, one row per position: the 61 cells in the order
+        of CELLS (0 empty, 1 first player, 2 second player), the side to move (1 or 2), the step, the search
+        score from the side to move's point of view and the final result for the side to move (1, 0.5 or 0)
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    players = [SelfPlayPlayer("W", "selfplay_1", depth), SelfPlayPlayer("B", "selfplay_2", depth)]
+    state = build_initial_state(players[0], players[1], config)
+    boards, to_move, steps, scores = [], [], [], []
+    while not state.is_done():
+        player = state.get_next_player()
+        player.current_step = state.get_step()
+        score, action = player.minimax_search(state)
+        legal_moves = state.get_legal_moves()
+        if state.get_step() < random_plies or action is None:
+            action = rng.choice(safe_actions(state) or state.get_possible_actions())
+        else:
+            # The transposition table may hand back the action of an identical board reached earlier.
+            to_move_pieces, n_i, n_j = action.move
+            action = legal_moves[(to_move_pieces[0], (n_i, n_j))]
+        position = encode_state(state)
+        boards.append(position.board)
+        to_move.append(position.to_move)
+        steps.append(position.step)
+        scores.append(score)
+        state = action.get_next_game_state()
+
+    winner_ids = state.compute_winner_ids()
+    results = [(1. if len(winner_ids) == 1 else 0.5) if player.get_id() in winner_ids else 0. for player in players]
+    return {
+        "board": np.array(boards, dtype=np.int8).reshape(-1, len(CELLS)),
+        "to_move": np.array(to_move, dtype=np.int8),
+        "step": np.array(steps, dtype=np.int16),
+        "score": np.array(scores, dtype=np.float32),
+        "result": np.array([results[side - 1] for side in to_move], dtype=np.float32),
+    }
+
+
+class ShardWriter:
+    """
+    Buffer labelled positions and write them to fixed-size shards, with a manifest to resume an interrupted run.
+
+    The manifest lists the written shards and the number of games they cover. Positions of finished games
+    that do not fill a shard yet are saved to a pending file on each commit and loaded back on resume.
+
+    Attributes:
+        directory (str): output directory
+        shard_size (int): number of positions of each shard
+        manifest (dict): content of the manifest
+        buffer (Dict[str, List[np.ndarray]]): positions not written to a shard yet
+    """
+
+    def __init__(self, directory: str, shard_size: int = SHARD_SIZE, settings: Optional[dict] = None) -> None:
+        """
+        Open the output directory, resuming from its manifest if there is one.
+
+        Args:
+            directory (str): output directory
+            shard_size (int, optional): number of positions of each shard
+            settings (dict, optional): generation settings, which must match those of the run being resumed
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.buffer = {field: [] for field in FIELDS}
+        self.buffered = 0
+        path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+            if settings is not None and self.manifest["settings"] != settings:
+                raise ValueError(f"{directory} was generated with other settings: {self.manifest['settings']}")
+        else:
+            self.manifest = {"settings": settings, "shard_size": shard_size, "games": 0, "positions": 0,
+                             "shards": [], "pending": None}
+        self.shard_size = self.manifest["shard_size"]
+        if self.manifest["pending"]:
+            with np.load(os.path.join(directory, self.manifest["pending"])) as pending:
+                self.append({field: pending[field] for field in FIELDS}, 0)
+
+    @property
+    def games(self) -> int:
+        return self.manifest["games"]
+
+    def append(self, game: Dict[str, np.ndarray], games: int = 1) -> None:
+        """
+        Add the positions of finished games and write the shards they complete.
+
+        Args:
+            game (Dict[str, np.ndarray]): positions of the games, as returned by `play_game`
+            games (int, optional): number of games the positions come from
+        """
+        for field in FIELDS:
+            self.buffer[field].append(game[field])
+        self.buffered += len(game["board"])
+        self.manifest["games"] += games
+        while self.buffered >= self.shard_size:
+            self.write_shard()
+
+    def skip(self, game: int) -> None:
+        """
+        Count a game that could not be played as finished, so that the games after it can be written, and record it
+        in the manifest.
+
+        Args:
+            game (int): index of the game
+        """
+        self.manifest.setdefault("skipped", []).append(game)
+        self.manifest["games"] += 1
+
+    def write_shard(self) -> None:
+        data = {field: np.concatenate(self.buffer[field]) for field in FIELDS}
+        name = f"shard-{len(self.manifest['shards']):06d}.npz"
+        self.save(name, {field: array[:self.shard_size] for field, array in data.items()})
+        self.buffer = {field: [array[self.shard_size:]] for field, array in data.items()}
+        self.buffered -= self.shard_size
+        self.manifest["shards"].append(name)
+        self.manifest["positions"] += self.shard_size
+        self.commit()
+
+    def commit(self) -> None:
+        """
+        Save the buffered positions to a new pending file, then atomically replace the manifest.
+
+        The manifest always counts the games whose positions are in its shards or its pending file, so a run
+        killed at any point resumes from the last commit without losing or duplicating positions.
+        """
+        previous = self.manifest["pending"]
+        pending = None
+        if self.buffered:
+            pending = f"pending-{self.games:09d}.npz"
+            self.save(pending, {field: np.concatenate(self.buffer[field]) for field in FIELDS})
+        self.manifest["pending"] = pending
+        self.save_manifest()
+        if previous and previous != pending:
+            os.remove(os.path.join(self.directory, previous))
+
+    def save_manifest(self) -> None:
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(path + ".tmp", path)
+
+    def save(self, name: str, data: Dict[str, np.ndarray]) -> None:
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **data)
+        os.replace(path + ".tmp", path)
+
+
+def quiet_worker() -> None:
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+
+def generate(directory: str, games: int, processes: Optional[int] = None, shard_size: int = SHARD_SIZE,
+             depth: int = SEARCH_DEPTH, random_plies: int = RANDOM_PLIES, config: str = "classic",
+             seed: int = 0) -> ShardWriter:
+    """
+    Play self-play games in a process pool and stream their positions to shards, resuming a previous run.
+
+    Games are collected in order and at most a few per process are in flight, so memory stays bounded
+    by one shard and a few games whatever the number of games.
+
+    Args:
+        directory (str): output directory
+        games (int): total number of games of the run, including those of the run being resumed
+        processes (int, optional): number of worker processes, defaults to the number of CPUs
+        shard_size (int, optional): number of positions of each shard
+        depth (int, optional): depth of the search
+        random_plies (int, optional): number of random moves at the start of each game
+        config (str, optional): starting board configuration
+        seed (int, optional): seed of the first game, game i being played with seed + i
+
+    Returns:
+        ShardWriter: the writer, committed
+    """
+    settings = {"depth": depth, "random_plies": random_plies, "config": config, "seed": seed}
+    writer = ShardWriter(directory, shard_size, settings)
+    task = partial(play_game, depth=depth, random_plies=random_plies, config=config)
+    processes = processes or os.cpu_count() or 1
+    with Pool(processes, initializer=quiet_worker) as pool:
+        in_flight = deque()
+        next_game = writer.games
+        try:
+            while next_game < games or in_flight:
+                while next_game < games and len(in_flight) < 4 * processes:
+                    in_flight.append(pool.apply_async(task, (seed + next_game,)))
+                    next_game += 1
+                writer.append(in_flight.popleft().get())
+        finally:
+            writer.commit()
+    return writer
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="selfplay_abalone.py",
+                                     description="Generates labelled positions from self-play games, in NumPy shards.")
+    parser.add_argument("directory", help="Output directory, an interrupted run in it is resumed")
+    parser.add_argument("-n", "--games", type=int, required=True, help="Total number of games")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("-s", "--shard-size", type=int, default=SHARD_SIZE, help="Number of positions per shard")
+    parser.add_argument("-d", "--depth", type=int, default=SEARCH_DEPTH, help="Search depth of the players")
+    parser.add_argument("--random-plies", type=int, default=RANDOM_PLIES, help="Random moves at the start of each game")
+    parser.add_argument("-c", "--config", choices=["classic", "alien"], default="classic", help="Starting board configuration")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game")
+    args = parser.parse_args()
+    quiet_worker()
+
+    writer = generate(args.directory, args.games, args.processes, args.shard_size, args.depth, args.random_plies,
+                      args.config, args.seed)
+    print(f"{writer.games} games, {writer.manifest['positions']} positions in {len(writer.manifest['shards'])} shards, "
+          f"{writer.buffered} pending")
@@ -0,0 +1,434 @@
+import ast
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from os.path import basename, dirname, splitext
+from typing import Any, Dict, List, Optional, Tuple
+
+import socketio
+from aiohttp import web
+from loguru import logger
+
+from board_abalone import BoardAbalone
+from game_state_abalone import GameStateAbalone, LazyAction
+from main_abalone import BOARD_DIM, build_initial_state
+from player_abalone import PlayerAbalone
+from seahorse.game.game_layout.board import Piece
+
+MAX_MATCHES = 16
+MAX_WAITING = 64
+TIME_LIMIT = 60 * 15
+
+# Engine of a match and stand-in of its opponent, in the worker process of the match (see `start_engine`).
+engine = None
+opponent = None
+
+# Compact, picklable description of a game state: the piece type of each occupied cell, the score of each
+# piece type, the step, the piece type to move and the piece type of the first player.
+StateRecord = Tuple[Dict[Tuple[int, int], str], Dict[str, float], int, str, str]
+
+
+class Forfeit(Exception):
+    """
+    Raised when the player to move loses the match without finishing it: timeout, illegal action or disconnection.
+    """
+
+
+class Seat:
+    """
+    A player of a match, either a connected client or the engine run by the server.
+
+    Attributes:
+        player (PlayerAbalone): the player of the game state
+        sid (str): socket.io session of the client, None for the engine or once the client disconnects
+        remote (bool): whether the seat is a client rather than the engine
+        waiting (bool): whether the client is in the lobby, waiting for a match
+        actions (asyncio.Queue): actions received from the client, None when it disconnects
+        remaining_time (float): time credit of the player, in seconds
+        executor (ProcessPoolExecutor): worker process of the engine during its match, None for a client
+    """
+
+    def __init__(self, player: PlayerAbalone, sid: Optional[str], time_limit: float) -> None:
+        self.player = player
+        self.sid = sid
+        self.remote = sid is not None
+        self.waiting = False
+        self.actions = asyncio.Queue()
+        self.remaining_time = time_limit
+        self.executor = None
+
+    def get_name(self) -> str:
+        return self.player.get_name()
+
+
+def load_player_class(path: str) -> type:
+    """
+    Import the MyPlayer class of a player file, as main_abalone does.
+
+    Args:
+        path (str): path of the player file
+
+    Returns:
+        type: its MyPlayer class
+    """
+    sys.path.append(dirname(path))
+    return __import__(splitext(basename(path))[0], fromlist=[None]).MyPlayer
+
+
+def state_to_record(state: GameStateAbalone) -> StateRecord:
+    """
+    Describe a game state independently of its player objects, to hand it over to another process.
+
+    Args:
+        state (GameStateAbalone): the state
+
+    Returns:
+        StateRecord: the description of the state
+    """
+    types = {player.get_id(): player.get_piece_type() for player in state.get_players()}
+    return ({cell: piece.get_type() for cell, piece in state.get_rep().get_env().items()},
+            {types[player_id]: score for player_id, score in state.get_scores().items()},
+            state.get_step(), state.get_next_player().get_piece_type(), state.get_players()[0].get_piece_type())
+
+
+def record_to_state(record: StateRecord, players: List[PlayerAbalone]) -> GameStateAbalone:
+    """
+    Rebuild a game state described by `state_to_record` with other player objects.
+
+    Args:
+        record (StateRecord): the description of the state
+        players (List[PlayerAbalone]): one player per piece type
+
+    Returns:
+        GameStateAbalone: the state, played by `players`
+    """
+    cells, scores, step, next_type, first_type = record
+    by_type = {player.get_piece_type(): player for player in players}
+    players = sorted(players, key=lambda player: player.get_piece_type() != first_type)
+    env = {cell: Piece(piece_type=piece_type, owner=by_type[piece_type]) for cell, piece_type in cells.items()}
+    return GameStateAbalone(
+        scores={by_type[piece_type].get_id(): score for piece_type, score in scores.items()},
+        next_player=by_type[next_type], players=players, rep=BoardAbalone(env=env, dim=BOARD_DIM), step=step)
+
+
+def quiet_worker() -> None:
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+
+def start_engine(path: str, piece_type: str, time_limit: float) -> None:
+    """
+    Create the engine of a match in the worker process dedicated to it.
+
+    The engine lives as long as the match, so that its transposition table, endgame table, time management and
+    own worker processes carry over from one move to the next, as in a local game.
+
+    Args:
+        path (str): path of the engine's player file
+        piece_type (str): piece type of the engine
+        time_limit (float): time credit of the engine, in seconds
+    """
+    global engine, opponent
+    quiet_worker()
+    engine = load_player_class(path)(piece_type, name="engine", time_limit=time_limit)
+    opponent = PlayerAbalone("B" if piece_type == "W" else "W", name="opponent")
+
+
+def engine_move(record: StateRecord) -> Tuple[Dict[Tuple[int, int], str], float]:
+    """
+    Compute the move of the engine created by `start_engine`, against a stand-in of its opponent.
+
+    Args:
+        record (StateRecord): the current state
+
+    Returns:
+        Tuple[Dict[Tuple[int, int], str], float]: the board after the move, as a piece type per occupied cell,
+        and the time the engine spent
+    """
+    state = record_to_state(record, [engine, opponent])
+    start = time.time()
+    engine.start_timer()
+    action = engine.compute_action(current_state=state)
+    engine.stop_timer()
+    elapsed = time.time() - start
+    return {cell: piece.get_type() for cell, piece in action.get_next_game_state().get_rep().get_env().items()}, elapsed
+
+
+class MatchServer:
+    """
+    Host many concurrent matches in one event loop.
+
+    Clients connect with the `connect` mode of main_abalone.py and are matched in their order of arrival, either
+    with each other or, if an engine is given, each with the engine, which runs in a worker process of its match.
+    At most `max_matches` matches are played at once and at most `max_waiting` clients wait for a match,
+    further connections being refused until a place frees up.
+
+    Attributes:
+        hostname (str): address the server listens on
+        port (int): port the server listens on
+        engine (str): path of the player file of the engine, None to match clients with each other
+        max_matches (int): maximum number of concurrent matches
+        max_waiting (int): maximum number of clients waiting for a match
+        time_limit (float): time credit of each player, in seconds
+        config (str): starting board configuration
+        results (List[dict]): summary of each finished match
+    """
+
+    def __init__(self, hostname: str, port: int, engine: Optional[str] = None, max_matches: int = MAX_MATCHES,
+                 max_waiting: int = MAX_WAITING, time_limit: float = TIME_LIMIT, config: str = "classic",
+                 results_path: Optional[str] = None) -> None:
+        """
+        Initialize the server, without starting it.
+
+        Args:
+            hostname (str): address to listen on
+            port (int): port to listen on
+            engine (str, optional): path of the player file of the engine
+            max_matches (int, optional): maximum number of concurrent matches
+            max_waiting (int, optional): maximum number of clients waiting for a match
+            time_limit (float, optional): time credit of each player, in seconds
+            config (str, optional): starting board configuration
+            results_path (str, optional): file to which a JSON line is appended for each finished match
+        """
+        self.hostname = hostname
+        self.port = port
+        self.engine = engine
+        self.max_matches = max_matches
+        self.max_waiting = max_waiting
+        self.time_limit = time_limit
+        self.config = config
+        self.results_path = results_path
+        self.results = []
+        self.seats = {}
+        self.lobby = asyncio.Queue()
+        self.match_ids = count(1)
+
+        self.sio = socketio.AsyncServer(async_mode="aiohttp", cors_allowed_origins="*", ping_timeout=1e6)
+        self.app = web.Application()
+        self.sio.attach(self.app)
+        self.sio.on("connect", self.on_connect)
+        self.sio.on("disconnect", self.on_disconnect)
+        self.sio.on("identify", self.on_identify)
+        self.sio.on("action", self.on_action)
+
+    def waiting_clients(self) -> int:
+        # The lobby may still hold clients that disconnected while waiting, they are dropped when dequeued.
+        return sum(seat.waiting for seat in self.seats.values())
+
+    async def on_connect(self, sid: str, environ: dict, *_) -> bool:
+        waiting = self.waiting_clients()
+        if waiting >= self.max_waiting:
+            logger.warning(f"Refusing a connection, {waiting} clients are already waiting")
+            return False
+        return True
+
+    async def on_identify(self, sid: str, data: str) -> None:
+        identifier = json.loads(data).get("identifier") or "client"
+        if sid in self.seats or identifier.startswith("__"):
+            # Already waiting or playing, or a GUI or recorder listener rather than a player.
+            return
+        seat = Seat(PlayerAbalone("W", name=f"{identifier}#{sid[:6]}"), sid, self.time_limit)
+        seat.waiting = True
+        self.seats[sid] = seat
+        await self.lobby.put(seat)
+        logger.info(f"{seat.get_name()} is waiting for a match ({self.waiting_clients()} waiting)")
+
+    async def on_action(self, sid: str, data: str) -> None:
+        if sid in self.seats:
+            await self.seats[sid].actions.put(data)
+
+    async def on_disconnect(self, sid: str) -> None:
+        seat = self.seats.pop(sid, None)
+        if seat is not None:
+            seat.sid = None
+            await seat.actions.put(None)
+
+    async def next_client(self) -> Seat:
+        while True:
+            seat = await self.lobby.get()
+            seat.waiting = False
+            if seat.sid is not None:
+                return seat
+
+    async def matchmaking(self, matches: Optional[int] = None) -> None:
+        """
+        Start matches as clients arrive, keeping at most `max_matches` of them running.
+
+        Args:
+            matches (int, optional): number of matches after which the server stops, None to serve forever
+        """
+        slots = asyncio.Semaphore(self.max_matches)
+        running = set()
+        started = 0
+        while matches is None or started < matches:
+            await slots.acquire()
+            seats = [await self.next_client()]
+            if self.engine is None:
+                seats.append(await self.next_client())
+                while seats[0].sid is None:
+                    # The first client left while the second one was awaited, the second one takes its place.
+                    seats = [seats[1], await self.next_client()]
+            else:
+                seats.append(Seat(PlayerAbalone("W", name=splitext(basename(self.engine))[0]), None, self.time_limit))
+            match_id = next(self.match_ids)
+            if self.engine is not None and match_id % 2 == 0:
+                # The engine moves first in every other match.
+                seats.reverse()
+            task = asyncio.create_task(self.play_match(match_id, seats))
+            running.add(task)
+            task.add_done_callback(lambda done: (running.discard(done), slots.release()))
+            started += 1
+        await asyncio.gather(*running)
+
+    async def play_match(self, match_id: int, seats: List[Seat]) -> List[int]:
+        """
+        Play a match between two seats.
+
+        Args:
+            match_id (int): identifier of the match
+            seats (List[Seat]): the two seats, the first one moving first
+
+        Returns:
+            List[int]: IDs of the winning players
+        """
+        for seat, piece_type in zip(seats, ("W", "B")):
+            seat.player.piece_type = piece_type
+            if seat.remote:
+                # The client takes the id and the colour of the player of its seat.
+                await self.sio.emit("update_id", json.dumps({"new_id": seat.player.get_id(), "piece_type": piece_type}),
+                                    to=seat.sid)
+            else:
+                seat.executor = ProcessPoolExecutor(1, initializer=start_engine,
+                                                    initargs=(self.engine, piece_type, self.time_limit))
+        by_id = {seat.player.get_id(): seat for seat in seats}
+        state = build_initial_state(seats[0].player, seats[1].player, self.config)
+        logger.info(f"Match {match_id}: {seats[0].get_name()} vs {seats[1].get_name()}")
+        scores = None
+        try:
+            while not state.is_done():
+                seat = by_id[state.get_next_player().get_id()]
+                try:
+                    action = await self.play_turn(seat, state)
+                except Forfeit as e:
+                    logger.warning(f"Match {match_id}: {seat.get_name()} forfeits ({e})")
+                    scores = {player_id: score for player_id, score in state.get_scores().items()
+                              if player_id != seat.player.get_id()}
+                    break
+                state = action.get_next_game_state()
+        finally:
+            for seat in seats:
+                if seat.executor is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, seat.executor.shutdown)
+
+        winner_ids = state.compute_winner_ids(scores)
+        result = {"match": match_id, "players": [seat.get_name() for seat in seats],
+                  "scores": [state.get_scores()[seat.player.get_id()] for seat in seats],
+                  "winners": [by_id[player_id].get_name() for player_id in winner_ids],
+                  "steps": state.get_step(), "forfeit": scores is not None}
+        self.record_result(result)
+        for seat in seats:
+            if seat.sid is not None:
+                await self.sio.emit("done", json.dumps(state.get_scores()), to=seat.sid)
+                await self.sio.disconnect(seat.sid)
+        return winner_ids
+
+    async def play_turn(self, seat: Seat, state: GameStateAbalone) -> LazyAction:
+        """
+        Get the action of the player to move, checking its legality and its time credit.
+
+        Args:
+            seat (Seat): seat of the player to move
+            state (GameStateAbalone): the current state
+
+        Raises:
+            Forfeit: if the player runs out of time, plays an illegal action or disconnects
+
+        Returns:
+            LazyAction: the action played
+        """
+        if not seat.remote:
+            try:
+                piece_types, elapsed = await asyncio.get_running_loop().run_in_executor(
+                    seat.executor, engine_move, state_to_record(state))
+            except Exception as e:
+                raise Forfeit(f"engine error: {e!r}")
+        else:
+            if seat.sid is None:
+                raise Forfeit("disconnected")
+            start = time.time()
+            await self.sio.emit("turn", json.dumps(self.turn_json(state, seat)), to=seat.sid)
+            try:
+                data = await asyncio.wait_for(seat.actions.get(), seat.remaining_time)
+            except asyncio.TimeoutError:
+                raise Forfeit("time credit expired")
+            if data is None:
+                raise Forfeit("disconnected")
+            elapsed = time.time() - start
+            piece_types = self.parse_board(data)
+        seat.remaining_time -= elapsed
+        if seat.remaining_time <= 0:
+            raise Forfeit("time credit expired")
+        action = state.convert_board_to_action(piece_types) if piece_types is not None else None
+        if action is None:
+            raise Forfeit("action not permitted")
+        return action
+
+    def turn_json(self, state: GameStateAbalone, seat: Seat) -> dict:
+        """
+        Serialize a state for the client of a seat, which replaces its own player with itself, as for `host_game`.
+
+        Args:
+            state (GameStateAbalone): the current state
+            seat (Seat): the seat of the client
+
+        Returns:
+            dict: the JSON-serializable state
+        """
+        json_state = json.loads(json.dumps(state.to_json(), default=lambda x: x.to_json()))
+        json_state["players"] = [str(player["id"]) if player["id"] == seat.player.get_id() else player
+                                 for player in json_state["players"]]
+        return json_state
+
+    @staticmethod
+    def parse_board(data: str) -> Optional[Dict[Tuple[int, int], str]]:
+        """
+        Read the board after the move from an action sent by a client, without evaluating any of its content.
+
+        Args:
+            data (str): the action, as serialized by the client
+
+        Returns:
+            Dict[Tuple[int, int], str]: the piece type of each occupied cell, None if the action is malformed
+        """
+        try:
+            env = json.loads(data)["next_game_state"]["rep"]["env"]
+            return {tuple(ast.literal_eval(cell)): piece["piece_type"] for cell, piece in env.items()}
+        except (ValueError, KeyError, TypeError, SyntaxError):
+            return None
+
+    def record_result(self, result: Dict[str, Any]) -> None:
+        self.results.append(result)
+        logger.info(f"Match {result['match']}: {' vs '.join(result['players'])} - scores {result['scores']}"
+                    f" - winner(s) {', '.join(result['winners'])}")
+        if self.results_path:
+            with open(self.results_path, "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+    async def serve(self, matches: Optional[int] = None) -> None:
+        """
+        Listen for clients and play matches.
+
+        Args:
+            matches (int, optional): number of matches after which the server stops, None to serve forever
+        """
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, self.hostname, self.port).start()
+        logger.info(f"Serving matches on {self.hostname}:{self.port}")
+        try:
+            await self.matchmaking(matches)
+        finally:
+            await runner.cleanup()
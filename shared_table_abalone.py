@@ -0,0 +1,147 @@
+import random
+import struct
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+from game_state_abalone import GameStateAbalone
+from my_player import TranspositionTable
+from playout_abalone import CELL_INDEX, CELLS, DIRECTIONS
+from seahorse.game.action import Action
+
+ZOBRIST_SEED = 8175
+DEFAULT_SLOTS = 1 << 20
+SLOT_BYTES = 16
+KEY_MASK = (1 << 64) - 1
+# Layout of the data word of a slot: the score as a float32, then the move and the depth.
+SCORE_MASK = (1 << 32) - 1
+MOVE_SHIFT = 32
+MOVE_MASK = (1 << 10) - 1
+MOVE_FLAG = 1 << 9
+DEPTH_SHIFT = 42
+DEPTH_MASK = (1 << 8) - 1
+OCCUPIED = 1 << 63
+
+
+def pack_entry(score: float, move: int, depth: int) -> int:
+    score_bits, = struct.unpack("<I", struct.pack("<f", score))
+    return OCCUPIED | min(depth, DEPTH_MASK) << DEPTH_SHIFT | move << MOVE_SHIFT | score_bits
+
+
+def unpack_entry(data: int) -> Tuple[float, int, int]:
+    score, = struct.unpack("<f", struct.pack("<I", data & SCORE_MASK))
+    return score, (data >> MOVE_SHIFT) & MOVE_MASK, (data >> DEPTH_SHIFT) & DEPTH_MASK
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Transposition table stored in a shared memory block, so that the processes of a parallel search probe and fill
+    the same table.
+
+    The table has a fixed number of 16-byte slots, the slot of a position being given by the low bits of its hash.
+    A slot holds two 64-bit words: the entry packed in one word (score as a float32, move as a cell of CELLS and a
+    direction of DIRECTIONS, depth) and the hash XOR the entry in the other. Reads and writes take no lock: a
+    slot torn by concurrent writers no longer verifies against the hash and reads as a miss. An entry replaces the
+    one in its slot unless the latter is deeper and belongs to another position.
+
+    The Zobrist keys are seeded, so every process hashes a position the same way. Scores are relative to the
+    player searching, so each piece type gets its own keys. The block belongs to the table that created it, which
+    removes it on `close`; processes started by the creating process attach to it by unpickling the table.
+
+    Attributes:
+        slots (int): number of slots, a power of two
+        piece_type (str): piece type of the player whose scores are stored
+        memory (shared_memory.SharedMemory): the shared memory block
+        view (memoryview): the slots of the block
+        words (memoryview): the slots, as 64-bit words
+        salt (int): key XORed into the hashes of the player
+        owner (bool): whether this table created the block
+    """
+
+    def __init__(self, slots: int = DEFAULT_SLOTS, piece_type: str = "W", name: Optional[str] = None) -> None:
+        """
+        Create a shared table, or attach to an existing one.
+
+        Args:
+            slots (int, optional): number of slots, a power of two
+            piece_type (str, optional): piece type of the player whose scores are stored
+            name (str, optional): name of the block of an existing table, None to create a new block
+        """
+        if slots <= 0 or slots & (slots - 1):
+            raise ValueError(f"The number of slots must be a power of two, not {slots}")
+        super().__init__(seed=ZOBRIST_SEED)
+        self.slots = slots
+        self.piece_type = piece_type
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * SLOT_BYTES)
+        self.view = self.memory.buf[:slots * SLOT_BYTES]
+        self.words = self.view.cast("Q")
+        self.salt = random.Random(f"{ZOBRIST_SEED}{piece_type}").getrandbits(64)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __getstate__(self) -> dict:
+        return {"slots": self.slots, "piece_type": self.piece_type, "name": self.name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["slots"], state["piece_type"], state["name"])
+
+    def slot(self, hash: int) -> Tuple[int, int]:
+        key = (hash ^ self.salt) & KEY_MASK
+        return key, 2 * (key & (self.slots - 1))
+
+    def probe(self, hash: int, state: GameStateAbalone) -> Optional[Tuple[float, Optional[Action], int]]:
+        """
+        Look up the entry of a position.
+
+        Args:
+            hash (int): hash of the position
+            state (GameStateAbalone): the position, whose legal moves give back the action of the entry
+
+        Returns:
+            Optional[Tuple[float, Optional[Action], int]]: score, best action and searched depth, None if the
+            position is not in the table
+        """
+        key, index = self.slot(hash)
+        data = self.words[index + 1]
+        if not data & OCCUPIED or self.words[index] ^ data != key:
+            return None
+        score, move, depth = unpack_entry(data)
+        action = None
+        if move & MOVE_FLAG:
+            action = state.get_legal_moves().get((CELLS[(move >> 3) & 0x3F], DIRECTIONS[move & 0x7]))
+        return score, action, depth
+
+    def record(self, hash: int, score: float, action: Optional[Action], depth: int) -> None:
+        key, index = self.slot(hash)
+        stored = self.words[index + 1]
+        if (stored & OCCUPIED and self.words[index] ^ stored != key
+                and (stored >> DEPTH_SHIFT) & DEPTH_MASK > depth):
+            return
+        move = 0
+        if action is not None:
+            to_move_pieces, n_i, n_j = action.move
+            move = MOVE_FLAG | CELL_INDEX[to_move_pieces[0]] << 3 | DIRECTIONS.index((n_i, n_j))
+        data = pack_entry(score, move, depth)
+        self.words[index + 1] = data
+        self.words[index] = key ^ data
+
+    def clear(self) -> None:
+        self.view[:] = bytes(len(self.view))
+
+    def __del__(self) -> None:
+        # The block cannot be unmapped while views on it remain.
+        if hasattr(self, "words"):
+            self.words.release()
+            self.view.release()
+
+    def close(self) -> None:
+        """
+        Detach from the block, and remove it if this table created it.
+        """
+        self.words.release()
+        self.view.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,33 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules of the project live at the root of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_abalone import load_suite, notation_to_state  # noqa: E402
+from main_abalone import build_initial_state  # noqa: E402
+from player_abalone import PlayerAbalone  # noqa: E402
+
+RANDOM_GAMES = 4
+SAMPLE_EVERY = 6
+
+
+@pytest.fixture(scope="session")
+def game_states():
+    """
+    Unfinished positions: those of the benchmark suite, then every few steps of seeded random games.
+    """
+    states = [notation_to_state(notation, [PlayerAbalone("W", "suite_1"), PlayerAbalone("B", "suite_2")])
+              for notation in load_suite().values()]
+    for game in range(RANDOM_GAMES):
+        rng = random.Random(game)
+        state = build_initial_state(PlayerAbalone("W", f"random_{game}_1"), PlayerAbalone("B", f"random_{game}_2"),
+                                    "classic" if game % 2 == 0 else "alien")
+        while not state.is_done():
+            if state.get_step() % SAMPLE_EVERY == 0:
+                states.append(state)
+            state = rng.choice(state.get_possible_actions()).get_next_game_state()
+    return [state for state in states if not state.is_done()]
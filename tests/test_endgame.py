@@ -0,0 +1,41 @@
+import pytest
+
+from endgame_abalone import EndgameSolver
+from playout_abalone import Position
+
+PLIES = 2
+SAMPLE_EVERY = 5
+
+
+def brute_force(position: Position) -> int:
+    """
+    Value of a position for the player to move, by plain negamax over every line, without pruning or table.
+    """
+    moves = position.legal_moves()
+    if position.is_done() or not moves:
+        return EndgameSolver().outcome(position)
+    value = None
+    for move in moves:
+        ejected = position.play(*move)
+        child = -brute_force(position)
+        position.undo(*move, ejected)
+        value = child if value is None else max(value, child)
+    return value
+
+
+@pytest.mark.parametrize("sudden_death", [False, True])
+def test_solver_matches_brute_force(game_states, sudden_death):
+    solver = EndgameSolver()
+    for state in game_states[::SAMPLE_EVERY]:
+        position = Position.from_state(state)
+        position.max_step = position.step + PLIES
+        if sudden_death:
+            # A capture can end the game, so that lines also end on the score rule and not only on the step rule.
+            position.max_score = max(position.scores) - 1
+        board = position.board[:]
+        value, move = solver.solve(position)
+        assert position.board == board
+        assert value == brute_force(position)
+        ejected = position.play(*move)
+        assert -brute_force(position) == value
+        position.undo(*move, ejected)
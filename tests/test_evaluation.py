@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from bench_abalone import load_suite, notation_to_state
+from models_abalone import INPUT_SIZE, MLPEvaluator
+from my_player import MyPlayer
+
+DEPTH = 2
+POSITIONS = ("classic-start", "classic-32", "alien-46")
+HIDDEN = 16
+
+
+def mlp_evaluator(batched: bool) -> MLPEvaluator:
+    rng = np.random.default_rng(0)
+    evaluator = MLPEvaluator([(rng.normal(0, 0.3, (INPUT_SIZE, HIDDEN)), rng.normal(0, 0.1, HIDDEN)),
+                              (rng.normal(0, 1, (HIDDEN, 1)), np.zeros(1))])
+    evaluator.batched = batched
+    return evaluator
+
+
+def search(notation: str, batched: bool) -> tuple:
+    state = notation_to_state(notation, [MyPlayer("W", "evaluation_1"), MyPlayer("B", "evaluation_2")])
+    player = state.get_next_player()
+    player.evaluator = mlp_evaluator(batched)
+    player.futility_margin = player.evaluator.futility_margin
+    player.cutoff = DEPTH
+    player.current_step = state.get_step()
+    score, action = player.minimax_search(state)
+    # Values evaluated ahead do not outlive the search: the opponent shares the positions.
+    assert all(child.score is None for child in state.get_possible_actions())
+    return score, action.move, player.statistics["nodes"]
+
+
+@pytest.mark.parametrize("name", POSITIONS)
+def test_batched_search_matches_unbatched(name):
+    notation = load_suite()[name]
+    score, move, nodes = search(notation, batched=False)
+    batched_score, batched_move, batched_nodes = search(notation, batched=True)
+    # The model computes in float32, whose rounding depends on the size of the batch.
+    assert batched_score == pytest.approx(score, rel=1e-5)
+    assert (batched_move, batched_nodes) == (move, nodes)
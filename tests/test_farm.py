@@ -0,0 +1,47 @@
+import time
+
+from farm_abalone import Coordinator
+
+LEASE_TIME = 0.05
+
+
+def coordinator(results: dict) -> Coordinator:
+    return Coordinator([{"job_id": "job-1"}, {"job_id": "job-2"}], on_result=results.__setitem__,
+                       lease_time=LEASE_TIME)
+
+
+def test_expired_lease_is_reissued_and_late_result_dropped():
+    results = {}
+    farm = coordinator(results)
+    assert farm.lease(1)["job_id"] == "job-1"
+    time.sleep(LEASE_TIME * 2)
+    # The expired job goes back to the front of the queue.
+    assert farm.lease(2)["job_id"] == "job-1"
+    farm.complete("job-1", 1, "late")
+    assert results == {}
+    farm.complete("job-1", 2, "on time")
+    farm.complete("job-1", 2, "duplicate")
+    assert results == {"job-1": "on time"}
+    assert farm.finished == {"job-1": True}
+
+
+def test_result_after_expiry_requeues_the_job():
+    results = {}
+    farm = coordinator(results)
+    farm.lease(1)
+    time.sleep(LEASE_TIME * 2)
+    farm.complete("job-1", 1, "late")
+    assert results == {}
+    assert list(farm.pending) == ["job-1", "job-2"]
+
+
+def test_heartbeats_keep_the_lease():
+    results = {}
+    farm = coordinator(results)
+    farm.lease(1)
+    for _ in range(4):
+        time.sleep(LEASE_TIME / 2)
+        farm.heartbeat("job-1", 1)
+    assert farm.lease(2)["job_id"] == "job-2"
+    farm.complete("job-1", 1, "done")
+    assert results == {"job-1": "done"}
@@ -0,0 +1,18 @@
+import pytest
+
+from bench_abalone import load_suite
+from memory_abalone import measure_decision
+
+DEPTH = 2
+POSITIONS = ("classic-start", "classic-32", "alien-46")
+# Budgets of a decision, with headroom over the measures of the suite at depth 2 (5 to 8 MB, 34 to 139 B/node).
+MAX_PEAK_MB = 16
+MAX_NODE_BYTES = 512
+
+
+@pytest.mark.parametrize("name", POSITIONS)
+def test_decision_memory_within_budget(name):
+    result = measure_decision(load_suite()[name], DEPTH)
+    assert result["nodes"] > 0
+    assert result["peak"] <= MAX_PEAK_MB * 2 ** 20, f"peak of {result['peak'] / 2 ** 20:.2f} MB"
+    assert result["node_bytes"] <= MAX_NODE_BYTES, f"{result['node_bytes']:.0f} B retained per node"
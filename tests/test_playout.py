@@ -0,0 +1,25 @@
+from playout_abalone import CELL_INDEX, DIRECTIONS, Position
+
+
+def test_legal_moves_match_game_state(game_states):
+    for state in game_states:
+        expected = {(CELL_INDEX[cell], DIRECTIONS.index(direction)) for cell, direction in state.get_legal_moves()}
+        moves = Position.from_state(state).legal_moves()
+        assert {(cell, direction) for cell, direction, _ in moves} == expected
+
+
+def test_moves_reach_the_positions_of_possible_actions(game_states):
+    for state in game_states:
+        position = Position.from_state(state)
+        board, scores = position.board[:], position.scores[:]
+        reached = set()
+        for move in position.legal_moves():
+            ejected = position.play(*move)
+            reached.add((tuple(position.board), tuple(position.scores), position.to_move))
+            position.undo(*move, ejected)
+            assert (position.board, position.scores) == (board, scores)
+        expected = set()
+        for action in state.get_possible_actions():
+            child = Position.from_state(action.get_next_game_state())
+            expected.add((tuple(child.board), tuple(child.scores), child.to_move))
+        assert reached == expected
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from selfplay_abalone import FIELDS, ShardWriter
+
+SHARD_SIZE = 16
+SETTINGS = {"depth": 1, "random_plies": 8, "config": "classic", "seed": 0}
+
+
+def fake_game(game: int, positions: int) -> dict:
+    return {
+        "board": np.full((positions, 61), game % 3, dtype=np.int8),
+        "to_move": np.full(positions, 1 + game % 2, dtype=np.int8),
+        "step": np.arange(positions, dtype=np.int16),
+        "score": np.full(positions, game, dtype=np.float32),
+        "result": np.full(positions, 0.5, dtype=np.float32),
+    }
+
+
+def read_run(directory) -> dict:
+    writer = ShardWriter(str(directory))
+    data = {field: [] for field in FIELDS}
+    for name in writer.manifest["shards"]:
+        with np.load(directory / name) as shard:
+            assert len(shard["board"]) == SHARD_SIZE
+            for field in FIELDS:
+                data[field].append(shard[field])
+    for field in FIELDS:
+        data[field].extend(writer.buffer[field])
+    return {field: np.concatenate(arrays) for field, arrays in data.items()}
+
+
+def test_interrupted_run_resumes_without_losing_or_duplicating_positions(tmp_path):
+    games = [fake_game(game, 5 + game % 7) for game in range(12)]
+
+    writer = ShardWriter(str(tmp_path), SHARD_SIZE, SETTINGS)
+    for game in games[:7]:
+        writer.append(game)
+    writer.commit()
+    # Positions appended after the last commit are lost with the process, and their games played again.
+    writer.append(games[7])
+    del writer
+
+    writer = ShardWriter(str(tmp_path), SHARD_SIZE, SETTINGS)
+    assert writer.games == 7
+    for game in games[writer.games:]:
+        writer.append(game)
+    writer.commit()
+
+    assert writer.games == len(games)
+    total = sum(len(game["board"]) for game in games)
+    assert writer.manifest["positions"] + writer.buffered == total
+    assert sorted(path.name for path in tmp_path.glob("pending-*")) == [writer.manifest["pending"]]
+    data = read_run(tmp_path)
+    for field in FIELDS:
+        np.testing.assert_array_equal(data[field], np.concatenate([game[field] for game in games]))
+
+
+def test_resume_with_other_settings_is_refused(tmp_path):
+    ShardWriter(str(tmp_path), SHARD_SIZE, SETTINGS).commit()
+    with pytest.raises(ValueError):
+        ShardWriter(str(tmp_path), SHARD_SIZE, {**SETTINGS, "depth": 2})
@@ -0,0 +1,67 @@
+import asyncio
+import socket
+from os.path import dirname, join
+
+import random_player_abalone
+from main_abalone import connect_player
+from server_abalone import MatchServer
+
+ENGINE = join(dirname(dirname(__file__)), "random_player_abalone.py")
+TIME_LIMIT = 60
+
+
+class ColourCheckingPlayer(random_player_abalone.MyPlayer):
+    """
+    Random player recording its piece type and the type of the pieces it owns at each of its moves.
+    """
+
+    moves = []
+
+    def compute_action(self, current_state, **kwargs):
+        owned = {piece.get_type() for piece in current_state.get_rep().get_env().values()
+                 if piece.get_owner_id() == self.get_id()}
+        self.moves.append((self.get_piece_type(), owned))
+        return super().compute_action(current_state, **kwargs)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+async def serve_clients(server: MatchServer, clients: int) -> None:
+    serving = asyncio.create_task(server.serve(matches=clients))
+    await asyncio.sleep(0.5)
+    for _ in range(clients):
+        client = connect_player(ColourCheckingPlayer, TIME_LIMIT)
+        await client.listen(master_address=f"http://localhost:{server.port}", keep_alive=False)
+    await asyncio.wait_for(serving, 120)
+
+
+def test_clients_play_both_colours_against_the_engine():
+    server = MatchServer("localhost", free_port(), engine=ENGINE, time_limit=TIME_LIMIT)
+    asyncio.run(serve_clients(server, 2))
+    # The engine moves second in the first match and first in the other one.
+    assert {result["players"].index("random_player_abalone") for result in server.results} == {0, 1}
+    for result in server.results:
+        assert not result["forfeit"]
+        assert result["steps"] == 50 or -6 in result["scores"]
+    assert {piece_type for piece_type, _ in ColourCheckingPlayer.moves} == {"W", "B"}
+    for piece_type, owned in ColourCheckingPlayer.moves:
+        assert owned == {piece_type}
+
+
+def test_clients_who_leave_the_lobby_are_dropped():
+    async def leave_lobby() -> tuple:
+        server = MatchServer("localhost", free_port(), max_waiting=2)
+        for sid in ("first", "second", "third"):
+            await server.on_identify(sid, '{"identifier": "client"}')
+        await server.on_disconnect("first")
+        await server.on_disconnect("third")
+        waiting = server.waiting_clients()
+        accepted = await server.on_connect("fourth", {})
+        return waiting, accepted, (await server.next_client()).sid, server.lobby.qsize()
+
+    # Only the second client counts as waiting and the first one is skipped, the third one stays queued until dequeued.
+    assert asyncio.run(leave_lobby()) == (1, True, "second", 1)
@@ -0,0 +1,201 @@
+import argparse
+import json
+import math
+import sys
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from game_state_abalone import GameStateAbalone
+from evaluation_abalone import DEFAULT_HEURISTIC_WEIGHTS, HEURISTIC_FEATURES, HeuristicEvaluator
+
+FIRST_PIECE_TYPE = "W"
+
+
+def load_recorded_game(path: str) -> List[GameStateAbalone]:
+    """
+    Load the successive game states of a game recorded with the `-r` flag.
+
+    Args:
+        path (str): path of the JSON file written by the StateRecorder
+
+    Returns:
+        List[GameStateAbalone]: game states, in the order they were played
+    """
+    with open(path) as f:
+        records = json.load(f)
+    states = []
+    for record in records:
+        state = GameStateAbalone.from_json(json.dumps(record))
+        next_player_id = record["next_player"]["id"] if isinstance(record["next_player"], dict) else None
+        state.next_player = state.get_player_id(next_player_id)
+        states.append(state)
+    return states
+
+
+def is_quiet(state: GameStateAbalone) -> bool:
+    """
+    Check if no opponent piece can be pushed off the board from the given state.
+
+    Args:
+        state (GameStateAbalone): the state to check
+
+    Returns:
+        bool: True if the state is quiet, False otherwise
+    """
+    if state.is_done() or state.next_player is None:
+        return False
+    return all(id_add in (None, state.next_player.get_id()) for _, id_add in state.generator())
+
+
+def game_result(final_state: GameStateAbalone, piece_type: str = FIRST_PIECE_TYPE) -> float:
+    """
+    Compute the result of a game for the player with the given piece type.
+
+    Args:
+        final_state (GameStateAbalone): last state of the game
+        piece_type (str, optional): piece type of the player
+
+    Returns:
+        float: 1 for a win, 0.5 for a draw and 0 for a loss
+    """
+    winners = [player for player in final_state.get_players()
+               if player.get_id() in final_state.compute_winner_ids()]
+    if not any(player.get_piece_type() == piece_type for player in winners):
+        return 0.
+    return 1. if len(winners) == 1 else 0.5
+
+
+def extract_game(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extract the heuristic features of the quiet positions of a recorded game.
+
+    Args:
+        path (str): path of the recorded game
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: feature matrix (one row per position) and game result of each row
+    """
+    states = load_recorded_game(path)
+    evaluator = HeuristicEvaluator()
+    features = [evaluator.heuristic_features(state, FIRST_PIECE_TYPE) for state in states if is_quiet(state)]
+    result = game_result(states[-1]) if states else 0.
+    x = np.array(features, dtype=np.float64).reshape(-1, len(HEURISTIC_FEATURES))
+    return x, np.full(len(x), result)
+
+
+def build_dataset(paths: List[str], processes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extract the quiet positions of several recorded games in parallel.
+
+    Args:
+        paths (List[str]): paths of the recorded games
+        processes (int, optional): number of worker processes, defaults to the number of CPUs
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: feature matrix and game results
+    """
+    with Pool(processes) as pool:
+        games = pool.map(extract_game, paths, chunksize=max(1, len(paths) // (4 * (processes or 8))))
+    if not games:
+        return np.empty((0, len(HEURISTIC_FEATURES))), np.empty(0)
+    return np.concatenate([x for x, _ in games]), np.concatenate([y for _, y in games])
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(x, -500, 500)))
+
+
+def fit_scale(evaluations: np.ndarray, results: np.ndarray) -> float:
+    """
+    Find the scaling constant K mapping evaluations to expected results, by ternary search.
+
+    Args:
+        evaluations (np.ndarray): heuristic value of each position
+        results (np.ndarray): game result of each position
+
+    Returns:
+        float: the scaling constant minimizing the mean squared error
+    """
+    low, high = -12., 2.
+    for _ in range(100):
+        a, b = low + (high - low) / 3, high - (high - low) / 3
+        error_a = np.mean((results - sigmoid(10 ** a * evaluations)) ** 2)
+        error_b = np.mean((results - sigmoid(10 ** b * evaluations)) ** 2)
+        if error_a < error_b:
+            high = b
+        else:
+            low = a
+    return 10 ** ((low + high) / 2)
+
+
+def fit_weights(x: np.ndarray, y: np.ndarray, weights: np.ndarray, scale: float,
+                epochs: int = 1000, learning_rate: float = 1.) -> Tuple[np.ndarray, float]:
+    """
+    Fit the heuristic weights against the game results with full-batch gradient descent (Texel tuning).
+
+    Args:
+        x (np.ndarray): feature matrix
+        y (np.ndarray): game result of each row
+        weights (np.ndarray): initial weights
+        scale (float): scaling constant K of the sigmoid
+        epochs (int, optional): number of gradient steps
+        learning_rate (float, optional): step size in the normalized feature space
+
+    Returns:
+        Tuple[np.ndarray, float]: tuned weights and final mean squared error
+    """
+    # Gradient descent runs on features divided by their deviation, so that the piece count
+    # (several thousands) and the positional terms (a few units) converge at the same pace.
+    deviation = x.std(axis=0)
+    deviation[deviation == 0] = 1
+    z = x / deviation
+    w = weights * deviation * scale
+    for _ in range(epochs):
+        p = sigmoid(z @ w)
+        gradient = z.T @ ((p - y) * p * (1 - p)) * (2 / len(y))
+        w -= learning_rate * gradient
+    error = float(np.mean((y - sigmoid(z @ w)) ** 2))
+    return w / (deviation * scale), error
+
+
+def export_weights(weights: np.ndarray, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump({feature: float(weight) for feature, weight in zip(HEURISTIC_FEATURES, weights)}, f, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tuning_abalone.py",
+                                     description="Tunes the weights of MyPlayer's heuristic on recorded games.")
+    parser.add_argument("games", nargs="+", help="Games recorded with the -r flag, or a dataset saved with --dataset")
+    parser.add_argument("-o", "--output", default="heuristic_weights.json", help="Where to export the tuned weights")
+    parser.add_argument("-d", "--dataset", help="Saves the extracted positions to this .npz file")
+    parser.add_argument("-e", "--epochs", type=int, default=1000, help="Number of gradient descent steps")
+    parser.add_argument("--lr", type=float, default=1., help="Learning rate")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Number of extraction processes")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    if len(args.games) == 1 and args.games[0].endswith(".npz"):
+        data = np.load(args.games[0])
+        x, y = data["x"], data["y"]
+    else:
+        x, y = build_dataset(args.games, args.processes)
+    if args.dataset:
+        np.savez_compressed(args.dataset, x=x, y=y)
+    print(f"{len(x)} quiet positions extracted")
+    if not len(x):
+        raise SystemExit(1)
+
+    initial_weights = np.array([DEFAULT_HEURISTIC_WEIGHTS[feature] for feature in HEURISTIC_FEATURES], dtype=np.float64)
+    scale = fit_scale(x @ initial_weights, y)
+    weights, error = fit_weights(x, y, initial_weights, scale, args.epochs, args.lr)
+    print(f"K = {scale:.3g}, mean squared error = {error:.5f}")
+    for feature, weight in zip(HEURISTIC_FEATURES, weights):
+        print(f"{feature}: {weight:.4f}")
+    if not all(map(math.isfinite, weights)):
+        raise SystemExit(1)
+    export_weights(weights, args.output)